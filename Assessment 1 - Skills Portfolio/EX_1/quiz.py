@@ -1,6 +1,18 @@
 import tkinter as tk
 from tkinter import messagebox
+import os
 import random
+import sys
+
+# The timing probes are shared by all three exercises and live in the portfolio folder one level up.
+# They load when that folder is on PYTHONPATH (see perf_probes.py); without them the app runs as before
+try:
+    import perf_probes
+except ImportError:
+    perf_probes = None
+    if os.environ.get("PERF_PROBES", "1") != "0":
+        print("Timing probes are off - run with the portfolio folder on PYTHONPATH to turn them on "
+              "(see perf_probes.py)", file=sys.stderr)
 
 class ArithmeticQuiz:
     def __init__(self, root):
@@ -559,8 +571,15 @@ class ArithmeticQuiz:
         )
         quit_btn.grid(row=0, column=1, padx=10)
 
+# Time every screen and answer check (F12 shows the numbers)
+if perf_probes:
+    perf_probes.instrument(ArithmeticQuiz, "displayMenu", "startQuiz", "displayProblem", "checkAnswer",
+                           "shake_widget", "displayResults")
+
 # Main program
 if __name__ == "__main__":
     root = tk.Tk()
     app = ArithmeticQuiz(root)
+    if perf_probes:
+        perf_probes.attach_overlay(root)
     root.mainloop()
\ No newline at end of file
@@ -1,7 +1,22 @@
-import tkinter as tk
-import random
 import os
-from typing import Tuple
+import sys
+import time
+import tkinter as tk
+from typing import Optional
+
+from joke_assets import AssetCache
+from joke_core import FALLBACK_JOKE, PREFETCH_DEPTH, Joke, JokePrefetcher
+from joke_sources import build_sources
+
+# The timing probes are shared by all three exercises and live in the portfolio folder one level up.
+# They load when that folder is on PYTHONPATH (see perf_probes.py); without them the app runs as before
+try:
+    import perf_probes
+except ImportError:
+    perf_probes = None
+    if os.environ.get("PERF_PROBES", "1") != "0":
+        print("Timing probes are off - run with the portfolio folder on PYTHONPATH to turn them on "
+              "(see perf_probes.py)", file=sys.stderr)
 
 # --- Color Palette ---
 COLOR_BG_MAIN = "#FFFAF0"       # Floral White
@@ -13,23 +28,49 @@ COLOR_TEXT_MAIN = "#2C3E50"     # Dark Blue Grey
 COLOR_TEXT_ACCENT = "#1A535C"   # Dark Cyan
 COLOR_BTN_HOVER = "#FF8E8E"     # Lighter Red for hover
 
+WINDOW_SIZE = (600, 750)
+WARM_POLL_MS = 50  # How often the window checks whether the background load has finished
+RESULTS_PER_PAGE = 5
+SEARCH_POLL_MS = 250  # How often a search is re-run while the search index is still catching up
+JOKE_POLL_MS = 50  # How often the prefetch buffer is checked again after it ran dry
+JOKE_WAIT_SECONDS = 3.0  # How long to wait for the buffer before telling the built-in joke instead
+
+
 class JokeApp:
     def __init__(self, root_window: tk.Tk):
         self.root_window = root_window
         self.root_window.title("Ultimate Joke Teller")
-        self.root_window.geometry("600x750")
+        self.root_window.geometry(f"{WINDOW_SIZE[0]}x{WINDOW_SIZE[1]}")
         self.root_window.resizable(False, False)
         self.root_window.configure(bg=COLOR_BG_MAIN)
 
         # Data holders
         self.current_joke_setup = ""
         self.current_joke_punchline = ""
+        self.search_hits = []
+        self.search_page = 0
+        self.search_after_id = None
+        self.joke_after_id = None
+        # randomJokes.txt unless JOKE_SOURCES says otherwise (a folder, SQLite, a web service...)
+        self.source = build_sources()
+        # Keeps the next few jokes ready so a click never waits on the source (None when turned off)
+        self.prefetcher = JokePrefetcher(self.source.next_joke).start() if PREFETCH_DEPTH > 0 else None
+        if perf_probes and self.prefetcher:
+            perf_probes.probes.gauge("JokeApp.prefetch", self.prefetcher.stats)
 
         # Setup UI
         self.setup_ui()
+
+        # The background picture is decoded and scaled off the main thread, then kept for good
+        self.assets = AssetCache(self.root_window, sizes=(WINDOW_SIZE,))
+        self.background_label = None
+        if perf_probes:
+            perf_probes.probes.gauge("JokeApp.assets", self.assets.stats)
+        self.assets.warm(self.show_background)
         
-        # Load first joke
-        self.fetch_new_content()
+        # Load the jokes in the background, then show the first one
+        self.source.warm()
+        self.show_first_joke()
 
     def setup_ui(self):
         # --- Main Container ---
@@ -83,17 +124,80 @@ class JokeApp:
         self.btn_next = create_hover_button(btn_frame, "Next Joke ➡️", self.fetch_new_content, COLOR_PRIMARY, COLOR_BTN_HOVER)
         self.btn_next.grid(row=0, column=1, padx=10)
 
+        # --- Search ---
+        search_frame = tk.Frame(self.main_frame, bg=COLOR_FRAME_BG)
+        search_frame.pack(fill=tk.X, padx=25)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, font=("Verdana", 12), relief=tk.SOLID, bd=1, fg=COLOR_TEXT_MAIN)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6)
+        search_entry.bind("<Return>", lambda e: self.search_jokes())
+        btn_search = create_hover_button(search_frame, "Search 🔍", self.search_jokes, COLOR_ACCENT, "#FFED99", fg_color=COLOR_TEXT_ACCENT)
+        btn_search.config(padx=10, pady=4)
+        btn_search.pack(side=tk.LEFT, padx=(10, 0))
+
+        self.results_list = tk.Listbox(self.main_frame, height=RESULTS_PER_PAGE, font=("Verdana", 10), relief=tk.SOLID, bd=1, fg=COLOR_TEXT_MAIN, selectbackground=COLOR_SECONDARY, activestyle="none", highlightthickness=0, exportselection=False)
+        self.results_list.pack(fill=tk.X, padx=25, pady=(10, 0))
+        self.results_list.bind("<<ListboxSelect>>", self.show_search_result)
+
+        paging_frame = tk.Frame(self.main_frame, bg=COLOR_FRAME_BG)
+        paging_frame.pack(fill=tk.X, padx=25, pady=5)
+        self.btn_prev_page = tk.Button(paging_frame, text="◀", command=lambda: self.search_jokes(self.search_page - 1), bg=COLOR_FRAME_BG, fg=COLOR_TEXT_ACCENT, relief=tk.FLAT, state=tk.DISABLED, cursor="hand2")
+        self.btn_prev_page.pack(side=tk.LEFT)
+        self.btn_next_page = tk.Button(paging_frame, text="▶", command=lambda: self.search_jokes(self.search_page + 1), bg=COLOR_FRAME_BG, fg=COLOR_TEXT_ACCENT, relief=tk.FLAT, state=tk.DISABLED, cursor="hand2")
+        self.btn_next_page.pack(side=tk.RIGHT)
+        self.results_label = tk.Label(paging_frame, text="", font=("Verdana", 9), bg=COLOR_FRAME_BG, fg=COLOR_TEXT_ACCENT)
+        self.results_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
         # Quit Button 
         quit_btn = tk.Button(self.root_window, text="Quit", command=self.root_window.destroy, bg="#ff4d4d", fg="white", font=("Segoe UI", 10, "bold"), relief=tk.FLAT, cursor="hand2")
         quit_btn.place(relx=0.99, rely=0.99, anchor=tk.SE)
         quit_btn.bind("<Enter>", lambda e: quit_btn.config(bg="#cc0000"))
         quit_btn.bind("<Leave>", lambda e: quit_btn.config(bg="#ff4d4d"))
 
+    def show_background(self):
+        """Puts the background picture behind everything, if there is one🖼️"""
+        image = self.assets.get(WINDOW_SIZE)
+        if image is None:
+            return  # Missing or unreadable: the plain background colour stays
+        if self.background_label is None:
+            self.background_label = tk.Label(self.root_window, bd=0)
+            self.background_label.place(x=0, y=0, relwidth=1, relheight=1)
+            self.background_label.lower()
+        self.background_label.config(image=image)
+
+    def show_first_joke(self):
+        """Waits (without blocking the window) for the background load, then shows a joke⏳"""
+        if self.source.ready.is_set():
+            self.fetch_new_content()
+        else:
+            self.root_window.after(WARM_POLL_MS, self.show_first_joke)
+
     def fetch_new_content(self):
         """Grabs a fresh joke from the stash instantly🤞"""
-        # Get the joke directly
-        setup, punchline = self.get_joke()
-        
+        if self.joke_after_id is not None:
+            self.root_window.after_cancel(self.joke_after_id)
+            self.joke_after_id = None
+        joke = self.get_joke()
+        if joke is not None:
+            self.show_joke(*joke)
+            return
+        # The buffer ran dry: say so and check back shortly while the prefetch thread refills it
+        self.setup_label.config(text="Thinking of a good one...")
+        self.punchline_label.config(text="")
+        self.btn_punchline.config(state=tk.DISABLED, cursor="arrow")
+        self.wait_for_joke(time.monotonic() + JOKE_WAIT_SECONDS)
+
+    def wait_for_joke(self, give_up_at: float):
+        """Shows the next prefetched joke as soon as there is one, or the built-in one if none comes⏳"""
+        self.joke_after_id = None
+        joke = self.prefetcher.take(retry=True)
+        if joke is None and time.monotonic() < give_up_at:
+            self.joke_after_id = self.root_window.after(JOKE_POLL_MS, lambda: self.wait_for_joke(give_up_at))
+            return
+        self.show_joke(*(joke or FALLBACK_JOKE))
+
+    def show_joke(self, setup: str, punchline: str):
+        """Puts a joke up with its punchline hidden"""
         # Update data
         self.current_joke_setup = setup
         self.current_joke_punchline = punchline
@@ -103,56 +207,50 @@ class JokeApp:
         self.punchline_label.config(text="")
         self.btn_punchline.config(state=tk.NORMAL, cursor="hand2")
 
-    def get_joke(self) -> Tuple[str, str]:
+    def get_joke(self) -> Optional[Joke]:
         """Picks a random joke from our secret text file stash🤞"""  
-        try:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            path = os.path.join(base_dir, "resources", "randomJokes.txt")
-            with open(path, "r", encoding="utf-8") as f:
-                raw_lines = [ln.rstrip("\n") for ln in f.readlines()]
-
-            # Normalize and collect non-empty lines
-            lines = [ln.strip() for ln in raw_lines]
-
-            jokes = []  # list of (setup, punchline)
-            i = 0
-            while i < len(lines):
-                line = lines[i]
-                if not line:
-                    i += 1
-                    continue
-
-                # Case 1: setup and punchline on same line separated by '?'
-                if "?" in line:
-                    parts = line.split("?", 1)
-                    setup = parts[0].strip() + "?"
-                    punch = parts[1].strip()
-
-                    # If punch is empty, try to take next non-empty line as punchline
-                    if not punch and i + 1 < len(lines) and lines[i + 1]:
-                        punch = lines[i + 1].strip()
-                        i += 1
-
-                    jokes.append((setup, punch))
-
-                else:
-                    # Case 2: two-line joke where setup doesn't include '?'
-                    # Treat current line as setup and next non-empty line as punchline
-                    if i + 1 < len(lines) and lines[i + 1]:
-                        setup = line
-                        punch = lines[i + 1].strip()
-                        jokes.append((setup, punch))
-                        i += 1
-
-                i += 1
-
-            if jokes:
-                setup, punch = random.choice(jokes)
-                return setup, punch
-        except Exception:
-            pass
-
-        return "Why did the developer go broke?", "Because he used up all his cache!"
+        # Whatever is waiting in the prefetch buffer, or None on a miss - the source itself can touch
+        # the disk or the network, so the Tk thread never asks it. Only with prefetching turned off
+        # (JOKE_PREFETCH=0) is the source asked here, falling back to the one built-in joke
+        if self.prefetcher is None:
+            return self.source.next_joke() or FALLBACK_JOKE
+        return self.prefetcher.take()
+
+    def search_jokes(self, page: int = 0):
+        """Finds jokes by keyword, best matches first, a page at a time🔍"""
+        if self.search_after_id is not None:
+            self.root_window.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        query = self.search_var.get()
+        results = self.source.search(query, page * RESULTS_PER_PAGE, RESULTS_PER_PAGE)
+        if page > 0 and results.total and not results.hits:
+            # The matches shrank (the file changed) since the last page, so show the new last one
+            page = (results.total - 1) // RESULTS_PER_PAGE
+            results = self.source.search(query, page * RESULTS_PER_PAGE, RESULTS_PER_PAGE)
+        self.search_page = page
+        self.search_hits = [joke for _, joke in results.hits]
+
+        self.results_list.delete(0, tk.END)
+        for setup, _ in self.search_hits:
+            self.results_list.insert(tk.END, setup)
+        first = page * RESULTS_PER_PAGE
+        if results.total:
+            status = f"{first + 1}-{first + len(self.search_hits)} of {results.total:,}"
+        else:
+            status = "No jokes found" if query.strip() else ""
+        if results.pending:
+            # The index is still being built or caught up, so look again shortly
+            status += " (indexing...)"
+            self.search_after_id = self.root_window.after(SEARCH_POLL_MS, lambda: self.search_jokes(page))
+        self.results_label.config(text=status)
+        self.btn_prev_page.config(state=tk.NORMAL if page > 0 else tk.DISABLED)
+        self.btn_next_page.config(state=tk.NORMAL if first + len(self.search_hits) < results.total else tk.DISABLED)
+
+    def show_search_result(self, event=None):
+        """Shows the joke picked from the search results"""
+        selection = self.results_list.curselection()
+        if selection and selection[0] < len(self.search_hits):
+            self.show_joke(*self.search_hits[selection[0]])
 
     def reveal_punchline(self):
         """The moment of truth! Shows the punchline."""
@@ -160,7 +258,13 @@ class JokeApp:
         self.btn_punchline.config(state=tk.DISABLED, cursor="arrow")
 
 
+# Time the button handlers and the joke lookup behind them (F12 shows the numbers)
+if perf_probes:
+    perf_probes.instrument(JokeApp, "fetch_new_content", "get_joke", "reveal_punchline", "search_jokes")
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = JokeApp(root)
+    if perf_probes:
+        perf_probes.attach_overlay(root)
     root.mainloop()
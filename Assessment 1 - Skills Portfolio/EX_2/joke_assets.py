@@ -0,0 +1,154 @@
+"""Images for the joke teller. The background is decoded once, scaled to each window size we use and
+kept as a PhotoImage for as long as the app runs, so redraws never go back to the file.
+
+The slow part (decoding and scaling) runs on a worker thread, and the scaled copy is saved as a PNG
+under resources/.scaled, which Tk reads natively and quickly on the next start. Pillow is optional:
+without it only images Tk can read itself (PNG/GIF) work, scaled down by whole-number steps. A missing
+or unreadable image just means no background - nothing is loaded until it's first asked for."""
+import os
+import threading
+import time
+import tkinter as tk
+from typing import Dict, Optional, Tuple
+
+# Pillow is optional - with it any image format works and scaling is smooth,
+# without it we fall back to what tk.PhotoImage can read and its integer subsample()
+try:
+    from PIL import Image, ImageTk
+except ImportError:
+    Image = ImageTk = None
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+BACKGROUND_PATH = os.path.join(RESOURCES_DIR, "background.png")
+SCALED_DIR = os.path.join(RESOURCES_DIR, ".scaled")
+ASSET_POLL_MS = 20  # How often the window checks whether the worker has finished
+
+Size = Tuple[int, int]
+
+
+def scaled_path(path: str, size: Size) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(SCALED_DIR, f"{name}_{size[0]}x{size[1]}.png")
+
+
+def is_fresh(copy: str, source: str) -> bool:
+    """True if copy exists and was written after source last changed"""
+    try:
+        return os.stat(copy).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except OSError:
+        return False
+
+
+def cover(image, size: Size):
+    """Scale a Pillow image to fill size, cropping the overflow evenly from both sides"""
+    width, height = size
+    scale = max(width / image.width, height / image.height)
+    resized = image.resize((max(width, round(image.width * scale)), max(height, round(image.height * scale))),
+                           Image.LANCZOS)
+    left = (resized.width - width) // 2
+    top = (resized.height - height) // 2
+    return resized.crop((left, top, left + width, top + height))
+
+
+class AssetCache:
+    """Decoded images pre-scaled to each of sizes (width, height). get() is always answered from memory once warm() has run"""
+
+    def __init__(self, root: tk.Misc, sizes, path: str = BACKGROUND_PATH):
+        self.root = root
+        self.path = path
+        self.sizes = tuple(sizes)
+        self.images: Dict[Size, tk.PhotoImage] = {}
+        self._prepared: Dict[Size, tuple] = {}  # What the worker made: ("file", png path) or ("pil", image)
+        self._done = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.timings: Dict[str, float] = {}
+        self.loaded_from = "not loaded"
+
+    def warm(self, on_ready=None) -> None:
+        """Decode and scale on a worker thread, then build the PhotoImages on the Tk thread"""
+        started = time.perf_counter()
+
+        def prepare():
+            try:
+                for size in self.sizes:
+                    self._prepared[size] = self._prepare(size)
+            finally:
+                self.timings["prepare_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                self._done.set()
+
+        def finish():
+            # PhotoImages belong to Tk, so they're only ever created here on its thread
+            if not self._done.is_set():
+                self.root.after(ASSET_POLL_MS, finish)
+                return
+            for size in self.sizes:
+                self._build(size)
+            self.timings["cold_start_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            if on_ready:
+                on_ready()
+
+        threading.Thread(target=prepare, name="joke-assets", daemon=True).start()
+        finish()
+
+    def _prepare(self, size: Size) -> Optional[tuple]:
+        # Worker thread: no Tk calls in here
+        if not os.path.exists(self.path):
+            self.loaded_from = "missing"
+            return None
+        cached = scaled_path(self.path, size)
+        if is_fresh(cached, self.path):
+            self.loaded_from = "scaled PNG"
+            return ("file", cached)
+        if Image is None:
+            self.loaded_from = "Tk"
+            return ("file", self.path)  # Tk will have to decode the original itself
+        try:
+            with Image.open(self.path) as original:
+                image = cover(original.convert("RGB"), size)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.makedirs(SCALED_DIR, exist_ok=True)
+            image.save(cached, "PNG")
+        except OSError:
+            pass  # Only a slower next start
+        self.loaded_from = "Pillow"
+        return ("pil", image)
+
+    def _build(self, size: Size) -> Optional[tk.PhotoImage]:
+        prepared = self._prepared.pop(size, None)
+        if prepared is None:
+            return None
+        kind, payload = prepared
+        started = time.perf_counter()
+        try:
+            if kind == "pil":
+                photo = ImageTk.PhotoImage(payload, master=self.root)
+            else:
+                photo = tk.PhotoImage(master=self.root, file=payload)
+                # Tk on its own can only shrink by whole steps: the biggest that still covers the window
+                step = max(1, min(photo.width() // size[0], photo.height() // size[1]))
+                if step > 1:
+                    photo = photo.subsample(step)
+        except tk.TclError:  # A format Tk can't read without Pillow (a JPEG, say), or a damaged file
+            self.loaded_from = "unreadable"
+            return None
+        self.timings[f"build_{size[0]}x{size[1]}_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.images[size] = photo
+        return photo
+
+    def get(self, size: Size) -> Optional[tk.PhotoImage]:
+        """The image at size, or None if there isn't one. Built on the spot (lazily) if warm() hasn't"""
+        photo = self.images.get(size)
+        if photo is not None:
+            self.hits += 1
+            return photo
+        self.misses += 1
+        if size not in self._prepared:
+            self._prepared[size] = self._prepare(size)
+        return self._build(size)
+
+    def stats(self) -> Dict[str, object]:
+        return {"from": self.loaded_from, "images": len(self.images), "hits": self.hits, "misses": self.misses,
+                **self.timings}
@@ -0,0 +1,892 @@
+"""The GUI-free side of the joke teller: parsing randomJokes.txt, the cached corpus, the
+byte-offset index used for joke files too big to keep in memory, the streaming reservoir
+picker, the shuffled deck, the prefetch buffer and keyword search. Nothing here imports tkinter."""
+import array
+import bisect
+import hashlib
+import json
+import marshal
+import math
+import mmap
+import os
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+JOKES_PATH = os.path.join(RESOURCES_DIR, "randomJokes.txt")
+# The index, deck and search files of joke files outside resources (a dir: source, say) are kept
+# here instead of being written into the user's own folders
+SIDECAR_DIR = os.path.join(RESOURCES_DIR, ".sidecars")
+FALLBACK_JOKE = ("Why did the developer go broke?", "Because he used up all his cache!")
+
+# --- Offset index ---
+# Files at least this big are served from a sidecar index (randomJokes.txt.idx, or one in SIDECAR_DIR
+# for files outside resources) of where each joke starts and ends, instead of being parsed into memory
+INDEX_MIN_BYTES = 16 * 1024 * 1024
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"JKI1"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHQQQ")  # magic, version, source mtime_ns, source size, joke count
+INDEX_RECORD = struct.Struct("<QI")      # byte offset of the joke, length in bytes
+
+# --- Picker ---
+# How a random joke is chosen. Set JOKE_PICKER in the environment to override:
+#   auto    keep small files in memory and index big ones (the default)
+#   memory  always parse the whole file into a list
+#   index   always go through the offset index
+#   stream  read the file from the top on every pick and reservoir-sample one joke, holding
+#           nothing between picks - for append-only feeds or when even an index is too much
+PICKER_MODES = ("auto", "memory", "index", "stream")
+PICKER_MODE = os.environ.get("JOKE_PICKER", "auto").strip().lower()
+if PICKER_MODE not in PICKER_MODES:
+    print(f"Ignoring JOKE_PICKER={PICKER_MODE!r}, expected one of {', '.join(PICKER_MODES)}", file=sys.stderr)
+    PICKER_MODE = "auto"
+
+# --- Deck ---
+# JOKE_ORDER=deck (the default) deals every joke once in a shuffled order before any repeats, and
+# remembers the order (randomJokes.txt.deck.order) and where it got to (randomJokes.txt.deck) so a
+# restart carries on. JOKE_ORDER=random picks independently every time. Stream mode always picks
+# independently, it has no count to deal from
+ORDERS = ("deck", "random")
+ORDER = os.environ.get("JOKE_ORDER", "deck").strip().lower()
+if ORDER not in ORDERS:
+    print(f"Ignoring JOKE_ORDER={ORDER!r}, expected one of {', '.join(ORDERS)}", file=sys.stderr)
+    ORDER = "deck"
+DECK_SUFFIX = ".deck"
+DECK_ORDER_SUFFIX = ".order"
+
+# --- Prefetch ---
+# Jokes picked ahead of time on a background thread, so "Next Joke" never waits on the disk.
+# JOKE_PREFETCH sets how many are kept ready (0 turns prefetching off)
+PREFETCH_DEPTH = 3
+try:
+    PREFETCH_DEPTH = max(0, int(os.environ.get("JOKE_PREFETCH", PREFETCH_DEPTH)))
+except ValueError:
+    print("Ignoring JOKE_PREFETCH, expected a whole number", file=sys.stderr)
+PREFETCH_RETRY_SECONDS = 1.0  # Back-off while the source has nothing to give (missing or empty file)
+
+# --- Search ---
+# Keyword search through an inverted index (each word -> the jokes it's in) ranked with BM25. The index
+# is saved as a sidecar (randomJokes.txt.search) and, when the file has grown and a hash of what was
+# indexed still matches its start, just the new jokes are added to it
+SEARCH_SUFFIX = ".search"
+SEARCH_VERSION = 2
+SEARCH_PAGE_SIZE = 10
+SEARCH_PREFIX_TERMS = 50  # Most words the last word of a query expands to as a prefix ("chick" -> "chicken")
+SETUP_WEIGHT = 2  # A word in the setup counts as this many in the punchline
+BM25_K1 = 1.2  # How quickly repeats of a word stop adding to the score
+BM25_B = 0.75  # How much longer jokes are penalised
+BISECT_COST = 20  # Roughly log2 of a posting list - probing with bisect beats a scan below this ratio
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can did do does for from had has have he her him his how i if in is it "
+    "its me my no not of on or our she so than that the their them then there they this to us was we were "
+    "what when where which who why will with you your".split())
+
+Joke = Tuple[str, str]
+T = TypeVar("T")
+
+
+def iter_jokes(lines: Iterable[Tuple[int, int, str]]) -> Iterator[Tuple[str, str, int, int]]:
+    """Streams (setup, punchline, start, end) out of (start, end, line) triples, where start and end
+    are the byte offsets of each line. Only ever looks one line ahead, so any size of file works"""
+    lines = iter(lines)
+    current = next(lines, None)
+    while current is not None:
+        start, end, line = current
+        line = line.strip()
+        if not line:
+            current = next(lines, None)
+            continue
+
+        following = next(lines, None)
+        # Case 1: setup and punchline on same line separated by '?'
+        if "?" in line:
+            parts = line.split("?", 1)
+            setup = parts[0].strip() + "?"
+            punch = parts[1].strip()
+
+            # If punch is empty, try to take next non-empty line as punchline
+            if not punch and following is not None and following[2].strip():
+                punch = following[2].strip()
+                end = following[1]
+                following = next(lines, None)
+
+            yield setup, punch, start, end
+
+        else:
+            # Case 2: two-line joke where setup doesn't include '?'
+            # Treat current line as setup and next non-empty line as punchline
+            if following is not None and following[2].strip():
+                yield line, following[2].strip(), start, following[1]
+                following = next(lines, None)
+
+        current = following
+
+
+def parse_jokes(raw_lines: Iterable[str]) -> List[Joke]:
+    """Turns the lines of the joke file into (setup, punchline) pairs"""
+    return [(setup, punch) for setup, punch, _, _ in iter_jokes((0, 0, line) for line in raw_lines)]
+
+
+def reservoir_pick(items: Iterable[T], rng: Optional[random.Random] = None) -> Optional[T]:
+    """One item chosen uniformly from a stream of unknown length in a single pass and O(1) memory:
+    the i-th item replaces the current choice with probability 1/i"""
+    randrange = (rng or random).randrange
+    chosen = None
+    for i, item in enumerate(items, 1):
+        if randrange(i) == 0:
+            chosen = item
+    return chosen
+
+
+def stream_random_joke(path: str, rng: Optional[random.Random] = None) -> Optional[Joke]:
+    """A uniformly random joke from one streaming pass over the file, without building a list or an index"""
+    picked = reservoir_pick(iter_jokes(iter_file_lines(path)), rng)
+    return picked[:2] if picked else None
+
+
+def iter_file_lines(path: str, offset: int = 0) -> Iterator[Tuple[int, int, str]]:
+    """(start, end, line) for every line of a UTF-8 file from offset on, read in binary so the offsets are exact"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            yield offset, offset + len(raw), raw.decode("utf-8")
+            offset += len(raw)
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size), which changes whenever the file is edited, or None if it's missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def sidecar_base(path: str) -> str:
+    """What path's index, deck and search files are named after (plus their suffix). Files in resources
+    keep them alongside; any other file gets them in SIDECAR_DIR under its name and a hash of its full path"""
+    path = os.path.abspath(path)
+    if os.path.normcase(os.path.dirname(path)) == os.path.normcase(RESOURCES_DIR):
+        return path
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(SIDECAR_DIR, f"{os.path.basename(path)}-{digest}")
+
+
+def index_path(path: str) -> str:
+    return sidecar_base(path) + INDEX_SUFFIX
+
+
+def build_index(path: str) -> int:
+    """Streams through the joke file once and writes its offset index. Returns the count"""
+    signature = file_signature(path)
+    tmp_path = index_path(path) + ".tmp"
+    count = 0
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    with open(tmp_path, "wb") as out:
+        out.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, 0, 0))
+        for _, _, start, end in iter_jokes(iter_file_lines(path)):
+            out.write(INDEX_RECORD.pack(start, end - start))
+            count += 1
+        # The header goes in last, so a half-written index never looks valid
+        out.seek(0)
+        out.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, signature[0], signature[1], count))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, index_path(path))
+    return count
+
+
+class JokeIndex:
+    """A memory-mapped offset index. Picking a joke is a random record, one seek and one short read,
+    so memory use stays at a few bytes per joke however large the file is"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(index_path(path), "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file can't be mapped
+            self._file.close()
+            raise
+        magic, version, mtime_ns, size, self.count = INDEX_HEADER.unpack_from(self._map, 0)
+        self.signature = (mtime_ns, size)
+        if (magic != INDEX_MAGIC or version != INDEX_VERSION
+                or len(self._map) != INDEX_HEADER.size + self.count * INDEX_RECORD.size):
+            self.close()
+            raise ValueError(f"{index_path(path)} is not a joke index")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def joke(self, i: int) -> Joke:
+        start, length = INDEX_RECORD.unpack_from(self._map, INDEX_HEADER.size + i * INDEX_RECORD.size)
+        return read_joke(self.path, start, length)
+
+    def random_joke(self) -> Optional[Joke]:
+        return self.joke(random.randrange(self.count)) if self.count else None
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+def read_joke(path: str, start: int, length: int) -> Joke:
+    """The joke in the length bytes at start, which hold exactly the line(s) it was parsed from"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(length).decode("utf-8")
+    for setup, punch, _, _ in iter_jokes((0, 0, line) for line in data.splitlines()):
+        return setup, punch
+    raise ValueError(f"no joke at offset {start}")
+
+
+def open_index(path: str) -> JokeIndex:
+    """The index for path, rebuilt first if it's missing, damaged or older than the joke file"""
+    try:
+        index = JokeIndex(path)
+        if index.signature == file_signature(path):
+            return index
+        index.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    build_index(path)
+    return JokeIndex(path)
+
+
+class JokeDeck:
+    """A shuffled deck of joke indices dealt with an O(1) cursor. The order itself is saved (to
+    <state>.order) only when it changes - a new shuffle or new jokes - and the few-byte cursor file
+    after every draw. Nothing is read until load(), which warm() runs off the Tk thread"""
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.order_path = state_path + DECK_ORDER_SUFFIX
+        self.cursor = 0
+        self.order = array.array("L")
+        self.order_id = 0  # Ties the cursor file to the order it counts through
+        self.last: Optional[int] = None  # The last index dealt, so a new deck doesn't open with it
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Reads the saved deck, if it hasn't been already"""
+        with self._lock:
+            self._load()
+
+    def _load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            with open(self.order_path, "rb") as f:
+                saved = marshal.load(f)
+            if saved["id"] != state["order"]:
+                raise ValueError("the cursor belongs to another shuffle")
+            self.order = _array("L", saved["order"])
+            self.order_id = saved["id"]
+            self.cursor = int(state["cursor"])
+            self.last = state.get("last")
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            self.cursor, self.order, self.last = 0, array.array("L"), None
+
+    def _save(self, order_changed: bool) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            if order_changed:
+                # The order goes first under a new id, so a crash in between leaves a cursor file that
+                # no longer matches it and the next run just starts a fresh deck
+                self.order_id = random.getrandbits(32)
+                tmp_path = self.order_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    marshal.dump({"id": self.order_id, "order": self.order.tobytes()}, f)
+                os.replace(tmp_path, self.order_path)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"order": self.order_id, "cursor": self.cursor, "last": self.last}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            pass  # A read-only folder just means the next run starts a fresh deck
+
+    def _shuffle(self, count: int) -> None:
+        order = array.array("L", range(count))
+        random.shuffle(order)
+        # Don't tell the last joke of one deck again as the first of the next
+        if count > 1 and order[0] == self.last:
+            swap = random.randrange(1, count)
+            order[0], order[swap] = order[swap], order[0]
+        self.order = order
+        self.cursor = 0
+
+    def _grow(self, count: int) -> None:
+        # Inside-out Fisher-Yates over the part not dealt yet: each new index lands in a random undealt
+        # slot and whatever was there moves to the end, so the cost is one swap per new joke
+        order = self.order
+        for i in range(len(order), count):
+            slot = random.randint(self.cursor, i)
+            order.append(i)
+            order[i], order[slot] = order[slot], order[i]
+
+    def draw(self, count: int) -> Optional[int]:
+        """The next joke index for a corpus of count jokes, or None if it's empty"""
+        if count <= 0:
+            return None
+        with self._lock:
+            self._load()
+            dealt = len(self.order)
+            order_changed = dealt != count or self.cursor >= dealt
+            if dealt > count or self.cursor >= dealt:
+                # A used-up deck (or none yet), or jokes were removed so the old order no longer fits
+                self._shuffle(count)
+            elif dealt < count:
+                # New jokes arrived: shuffle them in with the ones not dealt yet
+                self._grow(count)
+            index = self.order[self.cursor]
+            self.cursor += 1
+            self.last = index
+            self._save(order_changed)
+            return index
+
+
+def tokenize(text: str) -> List[str]:
+    """The searchable words of text: lower-cased runs of letters and digits, minus stop words and single letters"""
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def length_norms(lengths: array.array, total_words: int) -> array.array:
+    """BM25's K1 * (1 - B + B * length / average length) for each joke"""
+    scale = BM25_K1 * BM25_B * len(lengths) / (total_words or 1)
+    base = BM25_K1 * (1 - BM25_B)
+    return array.array("d", [base + scale * length for length in lengths])
+
+
+def search_path(path: str) -> str:
+    return sidecar_base(path) + SEARCH_SUFFIX
+
+
+def hash_range(path: str, start: int, stop: int, hasher):
+    """Feeds bytes [start, stop) of path into hasher and returns it"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _array(typecode: str, data: bytes) -> array.array:
+    values = array.array(typecode)
+    values.frombytes(data)
+    return values
+
+
+class SearchResults(NamedTuple):
+    """One page of hits as (score, joke), best first, out of total matches. pending is True while an
+    index is still being built or caught up with its file, so searching again may find more"""
+    total: int
+    hits: List[Tuple[float, Joke]]
+    pending: bool = False
+
+
+class JokeSearchIndex:
+    """An inverted index of one joke file. Every word maps to two parallel arrays, the ids of the jokes
+    it's in (ascending) and how often it's in each, so a million jokes take tens of MB rather than a
+    dict per joke. A joke's id is its position in the file, and hits are read back by byte offset, so
+    search works the same whichever way the corpus itself is held"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.postings: Dict[str, Tuple[array.array, array.array]] = {}  # word -> (joke ids, counts)
+        self.starts = array.array("Q")   # Byte offset of each joke
+        self.sizes = array.array("I")    # ...and its length in bytes
+        self.lengths = array.array("H")  # Words in each joke, for BM25's length normalisation
+        self.total_words = 0
+        self.norms = array.array("d")  # BM25's length term for each joke, worked out whenever the lengths change
+        self.signature: Optional[Tuple[int, int]] = None  # (mtime_ns, size) of the file when last indexed
+        self.indexed_bytes = 0  # Where the last indexed joke ends; an append is indexed from here
+        self.digest = ""  # SHA-1 of the file up to indexed_bytes, which an append leaves alone
+        self.busy = False
+        self.ready = threading.Event()
+        self._vocabulary: Optional[List[str]] = None  # Every word sorted, for prefix matching
+        self._last: Tuple[Optional[tuple], List[Tuple[float, int]]] = (None, [])  # Last ranking, for paging
+        self._lock = threading.Lock()  # Held while the index is read or changed
+        self._update_lock = threading.Lock()  # Only one update at a time
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def warm(self) -> None:
+        """Updates on a background thread, unless that's already happening"""
+        if self.busy:
+            return
+        self.busy = True
+
+        def update():
+            try:
+                self.update()
+            finally:
+                self.busy = False
+                self.ready.set()
+        threading.Thread(target=update, name="joke-search", daemon=True).start()
+
+    def stale(self) -> bool:
+        return file_signature(self.path) != self.signature
+
+    def update(self) -> bool:
+        """Catches up with the file: loads the saved index, adds any jokes appended since and rebuilds
+        from scratch only when the file was edited. Returns False if the file can't be read"""
+        with self._update_lock:
+            signature = file_signature(self.path)
+            if signature is None:
+                return False
+            if self.signature is None and self._load() and self.signature == signature:
+                return True
+            if signature == self.signature:
+                return True
+            try:
+                hasher = self._appended(signature)
+                if hasher is None:
+                    self._clear()
+                    hasher = hashlib.sha1()
+                self._extend(signature, hasher, reopen=hasher is not None and self._last_open())
+            except (OSError, UnicodeDecodeError):
+                return False
+            self._save()
+            return True
+
+    def _appended(self, signature: Tuple[int, int]):
+        # If the file has grown and still starts with exactly what was indexed, the hash of that part,
+        # ready to carry on over the new jokes. None means it was edited and has to be indexed again
+        if self.signature is None or signature[1] <= self.signature[1]:
+            return None
+        hasher = hash_range(self.path, 0, self.indexed_bytes, hashlib.sha1())
+        return hasher if hasher.hexdigest() == self.digest else None
+
+    def _last_open(self) -> bool:
+        # Whether what's appended can still change the last indexed joke, as it would in a full parse:
+        # its line never ended (no newline at the end of the file), or it's a question with no answer
+        # yet, which takes the next line as its punchline
+        if not self.starts:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(self.starts[-1])
+            data = f.read(self.sizes[-1])
+        if not data.endswith(b"\n"):
+            return True
+        for _, punch, _, _ in iter_jokes((0, 0, line) for line in data.decode("utf-8").splitlines()):
+            return not punch
+        return True
+
+    def _clear(self) -> None:
+        with self._lock:
+            self.postings = {}
+            self.starts, self.sizes, self.lengths = array.array("Q"), array.array("I"), array.array("H")
+            self.total_words = 0
+            self.norms = array.array("d")
+            self.indexed_bytes = 0
+            self.digest = ""
+            self._vocabulary = None
+
+    def _extend(self, signature: Tuple[int, int], hasher, reopen: bool = False) -> None:
+        # Index the jokes after indexed_bytes into new arrays first, so searches carry on meanwhile.
+        # hasher holds the hash of the file up to indexed_bytes. reopen parses the last indexed joke
+        # again along with what follows it, and its new entry replaces the old one
+        postings: Dict[str, Tuple[array.array, array.array]] = {}
+        starts, sizes, lengths = array.array("Q"), array.array("I"), array.array("H")
+        total_words = 0
+        doc = len(self.starts)
+        resume = self.indexed_bytes
+        dropped: List[str] = []
+        if reopen:
+            doc -= 1
+            resume = self.starts[doc]
+            setup, punch = read_joke(self.path, resume, self.sizes[doc])
+            dropped = sorted(set(tokenize(setup)) | set(tokenize(punch)))
+        first_doc = doc
+        end = self.indexed_bytes
+        for setup, punch, start, stop in iter_jokes(iter_file_lines(self.path, resume)):
+            counts: Dict[str, int] = {}
+            for word in tokenize(setup):
+                counts[word] = counts.get(word, 0) + SETUP_WEIGHT
+            for word in tokenize(punch):
+                counts[word] = counts.get(word, 0) + 1
+            for word, count in counts.items():
+                entry = postings.get(word)
+                if entry is None:
+                    entry = postings[word] = (array.array("I"), array.array("B"))
+                entry[0].append(doc)
+                entry[1].append(min(count, 255))
+            length = min(sum(counts.values()), 65535)
+            starts.append(start)
+            sizes.append(stop - start)
+            lengths.append(length)
+            total_words += length
+            doc += 1
+            end = stop
+        digest = hash_range(self.path, self.indexed_bytes, end, hasher).hexdigest()
+        # A new average length changes every joke's norm, so they're redone here rather than mid-search
+        total_words += self.total_words - sum(self.lengths[first_doc:])
+        lengths = self.lengths[:first_doc] + lengths
+        norms = length_norms(lengths, total_words)
+        # Words only the reopened joke had go, unless its new version still has them
+        vanished = {word for word in dropped if len(self.postings[word][0]) == 1} - postings.keys()
+        if postings or vanished:
+            vocabulary = sorted((self.postings.keys() - vanished) | postings.keys())
+        else:
+            vocabulary = self._vocabulary
+
+        with self._lock:
+            for word in dropped:
+                ids, counts = self.postings[word]
+                ids.pop()
+                counts.pop()
+                if not ids:
+                    del self.postings[word]
+            del self.starts[first_doc:]
+            del self.sizes[first_doc:]
+            for word, (ids, counts) in postings.items():
+                entry = self.postings.get(word)
+                if entry is None:
+                    self.postings[word] = (ids, counts)
+                else:
+                    entry[0].extend(ids)
+                    entry[1].extend(counts)
+            self.starts.extend(starts)
+            self.sizes.extend(sizes)
+            self.lengths, self.total_words, self.norms = lengths, total_words, norms
+            self.signature = signature
+            self.indexed_bytes = end
+            self.digest = digest
+            self._vocabulary = vocabulary
+
+    def _save(self) -> None:
+        with self._lock:
+            state = {
+                "version": SEARCH_VERSION,
+                "signature": self.signature,
+                "indexed_bytes": self.indexed_bytes,
+                "digest": self.digest,
+                "total_words": self.total_words,
+                "starts": self.starts.tobytes(),
+                "sizes": self.sizes.tobytes(),
+                "lengths": self.lengths.tobytes(),
+                "postings": {word: (ids.tobytes(), counts.tobytes()) for word, (ids, counts) in self.postings.items()},
+            }
+        tmp_path = search_path(self.path) + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                marshal.dump(state, f)
+            os.replace(tmp_path, search_path(self.path))
+        except OSError:
+            pass  # Only means indexing again on the next start
+
+    def _load(self) -> bool:
+        try:
+            with open(search_path(self.path), "rb") as f:
+                state = marshal.load(f)
+            if state["version"] != SEARCH_VERSION:
+                return False
+            postings = {word: (_array("I", ids), _array("B", counts))
+                        for word, (ids, counts) in state["postings"].items()}
+            starts, sizes = _array("Q", state["starts"]), _array("I", state["sizes"])
+            lengths = _array("H", state["lengths"])
+            signature = tuple(state["signature"])
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return False
+        if not len(starts) == len(sizes) == len(lengths):
+            return False
+        norms = length_norms(lengths, state["total_words"])
+        vocabulary = sorted(postings)
+        with self._lock:
+            self.postings, self.starts, self.sizes, self.lengths = postings, starts, sizes, lengths
+            self.total_words, self.norms = state["total_words"], norms
+            self.signature = signature
+            self.indexed_bytes = state["indexed_bytes"]
+            self.digest = state["digest"]
+            self._vocabulary = vocabulary
+        return True
+
+    def joke(self, doc: int) -> Joke:
+        with self._lock:
+            start, size = self.starts[doc], self.sizes[doc]
+        return read_joke(self.path, start, size)
+
+    def search(self, query: str) -> List[Tuple[float, int]]:
+        """Every joke containing all the words of query as (score, id), best first. The last word also
+        matches the words it's the start of ("chick" finds "chicken"), unless the query ends in a space"""
+        words = tokenize(query)
+        if not words:
+            return []
+        prefix = not query[-1:].isspace()
+        with self._lock:
+            key = (tuple(words), prefix, self.signature, len(self.starts))
+            if self._last[0] != key:
+                self._last = (key, self._rank(words, prefix))
+            return self._last[1]
+
+    def _completions(self, stem: str) -> List[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        found = []
+        i = bisect.bisect_left(vocabulary, stem)
+        while i < len(vocabulary) and vocabulary[i].startswith(stem) and len(found) < SEARCH_PREFIX_TERMS:
+            found.append(vocabulary[i])
+            i += 1
+        return found
+
+    def _rank(self, words: List[str], prefix: bool) -> List[Tuple[float, int]]:
+        count = len(self.starts)
+        if not count:
+            return []
+        # Each query word becomes a group of index words, any of which will do
+        groups = []
+        for i, word in enumerate(words):
+            if prefix and i == len(words) - 1:
+                terms = self._completions(word)
+            else:
+                terms = [word] if word in self.postings else []
+            if not terms:
+                return []
+            groups.append(terms)
+        # Start from the rarest group, so every later one only has to check a short candidate list
+        groups.sort(key=lambda terms: sum(len(self.postings[term][0]) for term in terms))
+
+        norms = self.norms
+        saturation = BM25_K1 + 1
+
+        def weigh(term):
+            # A word's postings and its idf, folded together with the (K1 + 1) every score is multiplied by
+            ids, counts = self.postings[term]
+            return ids, counts, saturation * math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+
+        first = groups[0]
+        if len(first) == 1:
+            ids, counts, idf = weigh(first[0])
+            scores = {doc: idf * n / (n + norms[doc]) for doc, n in zip(ids, counts)}
+        else:
+            scores: Dict[int, float] = {}
+            for term in first:
+                ids, counts, idf = weigh(term)
+                for doc, n in zip(ids, counts):
+                    scores[doc] = scores.get(doc, 0.0) + idf * n / (n + norms[doc])
+
+        for terms in groups[1:]:
+            matched: Dict[int, float] = {}
+            for term in terms:
+                ids, counts, idf = weigh(term)
+                if len(scores) * BISECT_COST < len(ids):
+                    # Few candidates against a long list: look each one up
+                    for doc, score in scores.items():
+                        j = bisect.bisect_left(ids, doc)
+                        if j < len(ids) and ids[j] == doc:
+                            n = counts[j]
+                            matched[doc] = matched.get(doc, score) + idf * n / (n + norms[doc])
+                else:
+                    for doc, n in zip(ids, counts):
+                        score = scores.get(doc)
+                        if score is not None:
+                            matched[doc] = matched.get(doc, score) + idf * n / (n + norms[doc])
+            scores = matched
+            if not scores:
+                return []
+        # The sort is stable, so equal scores keep the order they were found in (file order for one word)
+        return [(scores[doc], doc) for doc in sorted(scores, key=scores.__getitem__, reverse=True)]
+
+
+class JokeCorpus:
+    """The jokes, parsed once and only re-read when the file changes on disk. Small files are kept in
+    memory as a list; big ones are served from the offset index instead"""
+
+    def __init__(self, path: str = JOKES_PATH, index_min_bytes: int = INDEX_MIN_BYTES, mode: str = PICKER_MODE,
+                 order: str = ORDER):
+        if mode not in PICKER_MODES:
+            raise ValueError(f"unknown joke picker {mode!r}, expected one of {', '.join(PICKER_MODES)}")
+        if order not in ORDERS:
+            raise ValueError(f"unknown joke order {order!r}, expected one of {', '.join(ORDERS)}")
+        self.path = path
+        self.index_min_bytes = index_min_bytes
+        self.mode = mode
+        self.deck = JokeDeck(sidecar_base(path) + DECK_SUFFIX) if order == "deck" and mode != "stream" else None
+        self._jokes: List[Joke] = []
+        self._index: Optional[JokeIndex] = None
+        self._signature: Optional[Tuple[int, int]] = None  # (mtime_ns, size) the cache was built from
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+        self.search_index = JokeSearchIndex(path)
+
+    def warm(self) -> None:
+        """Loads the saved deck and parses (or indexes) the file on a background thread so the window
+        opens straight away, then brings the search index up to date"""
+        def load():
+            try:
+                if self.deck is not None:
+                    self.deck.load()
+                self.refresh()
+            finally:
+                self.ready.set()
+            self.search_index.warm()
+        threading.Thread(target=load, name="joke-corpus", daemon=True).start()
+
+    def refresh(self) -> bool:
+        """Brings the cache up to date with the file. Returns False if the file can't be read"""
+        signature = file_signature(self.path)
+        if signature is None:
+            return False
+        if self.mode == "stream" or signature == self._signature:
+            return True
+        with self._lock:
+            # Another thread may have re-read it while we waited
+            if signature != self._signature:
+                self._close_index()
+                self._jokes = []
+                try:
+                    if self.mode == "index" or (self.mode == "auto" and signature[1] >= self.index_min_bytes):
+                        self._index = open_index(self.path)
+                    else:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            self._jokes = parse_jokes(f)
+                except (OSError, UnicodeDecodeError, ValueError):
+                    self._signature = None
+                    return False
+                self._signature = signature
+            return True
+
+    def _close_index(self) -> None:
+        # The old map has to go before the index file is replaced (Windows won't replace a mapped file)
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def __len__(self) -> int:
+        # Stream mode keeps no count, so it's 0 there
+        return len(self._index) if self._index is not None else len(self._jokes)
+
+    def jokes(self) -> List[Joke]:
+        """Every joke as a list. Only for files small enough to keep in memory"""
+        if not self.refresh() or self._index is not None:
+            return []
+        return self._jokes
+
+    def joke(self, i: int) -> Joke:
+        """The i-th joke in file order"""
+        index = self._index
+        return index.joke(i) if index is not None else self._jokes[i]
+
+    def next_joke(self) -> Optional[Joke]:
+        """The next joke off the deck, or a random one when there's no deck"""
+        if self.deck is None:
+            return self.random_joke()
+        if not self.refresh():
+            return None
+        i = self.deck.draw(len(self))
+        if i is None:
+            return None
+        try:
+            return self.joke(i)
+        except (OSError, ValueError, IndexError, UnicodeDecodeError):
+            return None
+
+    def random_joke(self) -> Optional[Joke]:
+        """One joke picked uniformly at random, or None if there aren't any"""
+        if not self.refresh():
+            return None
+        if self.mode == "stream":
+            try:
+                return stream_random_joke(self.path)
+            except (OSError, UnicodeDecodeError):
+                return None
+        index = self._index
+        if index is not None:
+            try:
+                return index.random_joke()
+            except (OSError, ValueError, UnicodeDecodeError):
+                return None
+        return random.choice(self._jokes) if self._jokes else None
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        """limit of the jokes matching query, best first, skipping the first offset. Answers from the
+        index as it stands and has it catch up in the background if the file has changed"""
+        index = self.search_index
+        if index.stale():
+            index.warm()
+        ranked = index.search(query)
+        hits = []
+        for score, doc in ranked[offset:offset + limit]:
+            try:
+                hits.append((score, index.joke(doc)))
+            except (OSError, ValueError, IndexError, UnicodeDecodeError):
+                pass  # The file changed under us; the next update sorts it out
+        return SearchResults(len(ranked), hits, index.busy)
+
+
+class JokePrefetcher:
+    """Keeps the next few jokes ready in a bounded queue, filled by a background thread. take() never
+    waits: it's a hit when a joke is ready and a miss when the buffer has run dry"""
+
+    def __init__(self, source: Callable[[], Optional[Joke]], depth: int = PREFETCH_DEPTH):
+        self.source = source
+        self.depth = depth
+        self.hits = 0
+        self.misses = 0
+        self._buffer: "queue.Queue[Joke]" = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "JokePrefetcher":
+        if self.depth > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._fill, name="joke-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def _fill(self) -> None:
+        while not self._stop.is_set():
+            joke = self.source()
+            if joke is None:
+                self._stop.wait(PREFETCH_RETRY_SECONDS)
+                continue
+            # Blocks while the buffer is full, waking now and then to notice stop()
+            while not self._stop.is_set():
+                try:
+                    self._buffer.put(joke, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+
+    def take(self, retry: bool = False) -> Optional[Joke]:
+        """A ready joke, or None if none is buffered. retry=True is a caller looking again after a
+        miss, which doesn't count as another one"""
+        try:
+            joke = self._buffer.get_nowait()
+        except queue.Empty:
+            if not retry:
+                self.misses += 1
+            return None
+        self.hits += 1
+        return joke
+
+    def stats(self) -> Dict[str, float]:
+        taken = self.hits + self.misses
+        return {
+            "depth": self.depth,
+            "buffered": self._buffer.qsize(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / taken, 3) if taken else 0.0,
+        }
+
+    def stop(self) -> None:
+        self._stop.set()
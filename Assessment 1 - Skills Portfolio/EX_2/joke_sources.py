@@ -0,0 +1,480 @@
+"""Where the jokes come from. Every backend is a JokeSource with the same next_joke() call: the local
+text file, a folder of joke files, a SQLite database or an HTTP endpoint returning JSON. Slow sources
+sit behind a CachedSource, which answers straight from a size-bounded LRU cache on disk while a
+background asyncio loop tops the cache up, so the Tk thread never waits on the network. search()
+looks jokes up by keyword in the file and folder sources; the others have nothing to search.
+
+JOKE_SOURCES picks the backends, separated by ';' (one is chosen at random per joke):
+
+    file:resources/randomJokes.txt        the default
+    dir:/path/to/folder                   every *.txt file in the folder
+    sqlite:/path/to/jokes.db              a table jokes(setup TEXT, punchline TEXT)
+    http://host/joke, https://...         JSON {"setup", "punchline"}, a list of those or {"jokes": [...]}
+    cached+<any of the above>             put a local source behind the cache too
+
+For trying the HTTP backend without a real service, `python joke_sources.py --serve 8765` runs a
+stub endpoint that hands out jokes from randomJokes.txt."""
+import asyncio
+import glob
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from joke_core import (JOKES_PATH, SEARCH_PAGE_SIZE, Joke, JokeCorpus, SearchResults, file_signature,
+                       parse_jokes)
+
+DEFAULT_SOURCES = f"file:{JOKES_PATH}"
+CACHE_PATH = os.path.join(os.path.dirname(JOKES_PATH), "jokeCache.db")
+CACHE_MAX_BYTES = 256 * 1024  # The cache evicts least recently used jokes past this much joke text
+try:
+    CACHE_MAX_BYTES = int(os.environ.get("JOKE_CACHE_BYTES", CACHE_MAX_BYTES))
+except ValueError:
+    print("Ignoring JOKE_CACHE_BYTES, expected a whole number", file=sys.stderr)
+REFILL_BATCH = 8        # Jokes asked for each time the cache is topped up
+REFILL_RETRY_SECONDS = 30  # Back-off after a refill that got nothing (service down, offline)
+HTTP_TIMEOUT = 5
+HTTP_USER_AGENT = "UltimateJokeTeller/1.0"
+
+
+class JokeSource(ABC):
+    """One place jokes come from. next_joke() must be quick enough to call on the Tk thread"""
+    name = "source"
+
+    def __init__(self):
+        self.ready = threading.Event()
+
+    def warm(self) -> None:
+        """Gets ready in the background; sets self.ready when done"""
+        self.ready.set()
+
+    @abstractmethod
+    def next_joke(self) -> Optional[Joke]:
+        """One joke, or None if this source has none to give right now"""
+
+    def fetch_batch(self, size: int) -> List[Joke]:
+        """Up to size jokes for a cache to keep. May be slow, only ever called off the Tk thread"""
+        jokes = []
+        for _ in range(size):
+            joke = self.next_joke()
+            if joke is None:
+                break
+            jokes.append(joke)
+        return jokes
+
+    async def fetch_batch_async(self, size: int) -> List[Joke]:
+        """fetch_batch for the background loop. Blocking sources run on its thread pool"""
+        return await asyncio.to_thread(self.fetch_batch, size)
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        """Jokes matching query, best first. Sources that can't be searched find nothing"""
+        return SearchResults(0, [])
+
+    def close(self) -> None:
+        pass
+
+
+def merge_results(pages: List[SearchResults], offset: int, limit: int) -> SearchResults:
+    """One page out of several sources' results, each already holding their first offset + limit hits"""
+    hits = heapq.merge(*(page.hits for page in pages), key=lambda hit: -hit[0])
+    return SearchResults(sum(page.total for page in pages), list(itertools.islice(hits, offset, offset + limit)),
+                         any(page.pending for page in pages))
+
+
+class FileSource(JokeSource):
+    """A single joke text file, through the cached/indexed/deck-dealt JokeCorpus"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.name = f"file:{path}"
+        self.corpus = JokeCorpus(path)
+        self.ready = self.corpus.ready
+
+    def warm(self) -> None:
+        self.corpus.warm()
+
+    def next_joke(self) -> Optional[Joke]:
+        return self.corpus.next_joke()
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        return self.corpus.search(query, offset, limit)
+
+
+class DirectorySource(JokeSource):
+    """Every *.txt joke file in a folder. Each file is its own corpus (with its own deck, kept under
+    resources/.sidecars rather than in the folder), and a file is picked in proportion to how many jokes it has, so every joke is about
+    equally likely"""
+
+    def __init__(self, folder: str, pattern: str = "*.txt"):
+        super().__init__()
+        self.name = f"dir:{folder}"
+        self.folder = folder
+        self.pattern = pattern
+        self._corpora: Dict[str, JokeCorpus] = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        def load():
+            try:
+                self._rescan()
+            finally:
+                self.ready.set()
+        threading.Thread(target=load, name="joke-dir", daemon=True).start()
+
+    def _rescan(self) -> None:
+        # Only when files have been added or removed, which changes the folder's mtime
+        signature = file_signature(self.folder)
+        if signature == self._signature:
+            return
+        with self._lock:
+            paths = set(glob.glob(os.path.join(self.folder, self.pattern)))
+            self._corpora = {path: self._corpora.get(path) or JokeCorpus(path) for path in sorted(paths)}
+            for corpus in self._corpora.values():
+                corpus.refresh()
+            self._signature = signature
+
+    def next_joke(self) -> Optional[Joke]:
+        self._rescan()
+        corpora = [corpus for corpus in self._corpora.values() if corpus.refresh() and len(corpus)]
+        if not corpora:
+            return None
+        corpus = random.choices(corpora, weights=[len(corpus) for corpus in corpora])[0]
+        return corpus.next_joke()
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        self._rescan()
+        return merge_results([corpus.search(query, 0, offset + limit) for corpus in list(self._corpora.values())],
+                             offset, limit)
+
+
+class SQLiteSource(JokeSource):
+    """A jokes(setup, punchline) table. A random rowid between the smallest and largest is looked up
+    through the primary key, so a pick costs the same however big the table is (gaps in the rowids
+    make the rows straight after a gap a little more likely)"""
+
+    def __init__(self, db_path: str, table: str = "jokes"):
+        super().__init__()
+        self.name = f"sqlite:{db_path}"
+        self.db_path = db_path
+        self.table = table
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # The prefetch thread and the Tk thread share the connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            # Read-only, and never create an empty database just because the path was wrong
+            self._db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        return self._db
+
+    def next_joke(self) -> Optional[Joke]:
+        with self._lock:
+            try:
+                db = self._connect()
+                low, high = db.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {self.table}").fetchone()
+                if low is None:
+                    return None
+                row = db.execute(f"SELECT setup, punchline FROM {self.table} WHERE rowid >= ? ORDER BY rowid LIMIT 1",
+                                 (random.randint(low, high),)).fetchone()
+            except sqlite3.Error:
+                return None
+        return (str(row[0]), str(row[1])) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def jokes_from_json(data) -> List[Joke]:
+    """Accepts {"setup", "punchline"}, a list of those, or {"jokes": [...]}"""
+    if isinstance(data, dict) and isinstance(data.get("jokes"), list):
+        data = data["jokes"]
+    if isinstance(data, dict):
+        data = [data]
+    jokes = []
+    for item in data if isinstance(data, list) else []:
+        if isinstance(item, dict) and item.get("setup") and item.get("punchline"):
+            jokes.append((str(item["setup"]).strip(), str(item["punchline"]).strip()))
+    return jokes
+
+
+class HttpSource(JokeSource):
+    """A JSON endpoint. build_sources always puts it behind a CachedSource, whose background loop runs
+    several requests at once with asyncio; the HTTP itself is urllib on asyncio's thread pool"""
+
+    def __init__(self, url: str, timeout: float = HTTP_TIMEOUT):
+        super().__init__()
+        self.name = url
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> List[Joke]:
+        request = urllib.request.Request(self.url, headers={"Accept": "application/json",
+                                                            "User-Agent": HTTP_USER_AGENT})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return jokes_from_json(json.loads(response.read().decode("utf-8")))
+
+    async def fetch_batch_async(self, size: int) -> List[Joke]:
+        # One request per joke asked for, all in flight together; failures are simply skipped
+        results = await asyncio.gather(*(asyncio.wait_for(asyncio.to_thread(self.fetch), self.timeout + 1)
+                                         for _ in range(size)), return_exceptions=True)
+        return [joke for result in results if isinstance(result, list) for joke in result]
+
+    def next_joke(self) -> Optional[Joke]:
+        # Blocking - fine off the Tk thread, which is the only place an uncached one gets called
+        try:
+            jokes = self.fetch()
+        except (OSError, ValueError):
+            return None
+        return random.choice(jokes) if jokes else None
+
+
+class JokeCache:
+    """A size-bounded LRU cache of jokes in a small SQLite file. Each joke remembers when it was last
+    handed out; once the stored text passes max_bytes the least recently used ones are dropped"""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS jokes (key TEXT PRIMARY KEY, source TEXT, setup TEXT,"
+                             " punchline TEXT, bytes INTEGER, used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jokes_used ON jokes (used)")
+
+    @staticmethod
+    def key(joke: Joke) -> str:
+        return hashlib.sha1("\n".join(joke).encode("utf-8")).hexdigest()
+
+    def put_many(self, source: str, jokes: List[Joke]) -> None:
+        now = time.time()
+        rows = [(self.key(joke), source, joke[0], joke[1], len(joke[0].encode()) + len(joke[1].encode()), now)
+                for joke in jokes]
+        with self._lock, self._db:
+            # A joke we already have keeps its last-used time
+            self._db.executemany("INSERT OR IGNORE INTO jokes VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM jokes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used, dropping until we're back under the limit
+        drop = []
+        for key, size in self._db.execute("SELECT key, bytes FROM jokes ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM jokes WHERE key = ?", drop)
+
+    def count(self, source: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jokes WHERE source = ?", (source,)).fetchone()[0]
+
+    def take(self, source: str) -> Optional[Joke]:
+        """The joke from this source that was handed out longest ago (or never), marked as used now"""
+        with self._lock, self._db:
+            row = self._db.execute("SELECT key, setup, punchline FROM jokes WHERE source = ? ORDER BY used LIMIT 1",
+                                   (source,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE jokes SET used = ? WHERE key = ?", (time.time(), row[0]))
+        return row[1], row[2]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class BackgroundLoop:
+    """One asyncio event loop on a daemon thread, shared by every cached source"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="joke-sources", daemon=True).start()
+
+    @classmethod
+    def get(cls) -> "BackgroundLoop":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = BackgroundLoop()
+            return cls._instance
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+class CachedSource(JokeSource):
+    """Answers from the on-disk cache straight away and asks the real source for more in the
+    background, so a slow or offline source never holds up a click"""
+
+    def __init__(self, source: JokeSource, cache: JokeCache, batch: int = REFILL_BATCH):
+        super().__init__()
+        self.name = source.name
+        self.source = source
+        self.cache = cache
+        self.batch = batch
+        self._refilling = False
+        self._retry_at = 0.0
+        self._loop = BackgroundLoop.get()
+
+    def warm(self) -> None:
+        self.source.warm()
+        self._refill()
+        self.ready.set()  # The cache is usable right away, even if it's still empty
+
+    def _refill(self) -> None:
+        if self._refilling or time.monotonic() < self._retry_at:
+            return
+        self._refilling = True
+        self._loop.submit(self._refill_async())
+
+    async def _refill_async(self) -> None:
+        try:
+            jokes = await self.source.fetch_batch_async(self.batch)
+            if jokes:
+                self.cache.put_many(self.name, jokes)
+            else:
+                self._retry_at = time.monotonic() + REFILL_RETRY_SECONDS
+        except Exception:  # Whatever went wrong, the cache still has what it had
+            self._retry_at = time.monotonic() + REFILL_RETRY_SECONDS
+        finally:
+            self._refilling = False
+
+    def next_joke(self) -> Optional[Joke]:
+        self._refill()  # Keep fresh jokes flowing in while we serve what's cached
+        return self.cache.take(self.name)
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        return self.source.search(query, offset, limit)
+
+    def close(self) -> None:
+        self.source.close()
+
+
+class MultiSource(JokeSource):
+    """Several sources together. Each joke comes from one picked at random, moving on to the others
+    if it has nothing to give"""
+
+    def __init__(self, sources: List[JokeSource]):
+        super().__init__()
+        self.name = "; ".join(source.name for source in sources)
+        self.sources = sources
+
+    def warm(self) -> None:
+        for source in self.sources:
+            source.warm()
+
+        def wait():
+            for source in self.sources:
+                source.ready.wait()
+            self.ready.set()
+        threading.Thread(target=wait, name="joke-sources-ready", daemon=True).start()
+
+    def next_joke(self) -> Optional[Joke]:
+        for source in random.sample(self.sources, len(self.sources)):
+            joke = source.next_joke()
+            if joke is not None:
+                return joke
+        return None
+
+    def search(self, query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> SearchResults:
+        return merge_results([source.search(query, 0, offset + limit) for source in self.sources], offset, limit)
+
+    def close(self) -> None:
+        for source in self.sources:
+            source.close()
+
+
+def build_sources(spec: Optional[str] = None, cache_path: str = CACHE_PATH) -> JokeSource:
+    """Turns a JOKE_SOURCES string into a single source (see the top of this file for the format)"""
+    if spec is None:
+        spec = os.environ.get("JOKE_SOURCES") or DEFAULT_SOURCES
+    cache = None
+    sources: List[JokeSource] = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        cached = entry.startswith("cached+")
+        if cached:
+            entry = entry[len("cached+"):]
+        kind, _, target = entry.partition(":")
+        if kind in ("http", "https"):
+            source, cached = HttpSource(entry), True
+        elif kind == "file":
+            source = FileSource(target)
+        elif kind == "dir":
+            source = DirectorySource(target)
+        elif kind == "sqlite":
+            source = SQLiteSource(target)
+        else:
+            print(f"Ignoring joke source {entry!r}", file=sys.stderr)
+            continue
+        if cached:
+            if cache is None:
+                cache = JokeCache(cache_path)
+            source = CachedSource(source, cache)
+        sources.append(source)
+    if not sources:
+        sources.append(FileSource(JOKES_PATH))
+    return sources[0] if len(sources) == 1 else MultiSource(sources)
+
+
+def stub_server(port: int = 0, path: str = JOKES_PATH, delay: float = 0.0):
+    """A tiny local stand-in for a joke service: GET / returns one random joke from the file as JSON.
+    Returns the server unstarted; port 0 picks a free one (see server.server_address)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with open(path, "r", encoding="utf-8") as f:
+        jokes = parse_jokes(f)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)  # Pretend to be a slow service
+            setup, punchline = random.choice(jokes)
+            body = json.dumps({"setup": setup, "punchline": punchline}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def serve_stub(port: int, path: str = JOKES_PATH, delay: float = 0.0) -> None:
+    """Runs the stub endpoint until Ctrl+C"""
+    server = stub_server(port, path, delay)
+    print(f"Serving jokes on http://127.0.0.1:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Joke sources for the joke teller")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="run the stub HTTP joke endpoint")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the stub waits before answering")
+    args = parser.parse_args()
+    if args.serve:
+        serve_stub(args.serve, delay=args.delay)
+    else:
+        parser.print_help()
@@ -0,0 +1,231 @@
+# Benchmarks for the Student Manager's data paths. Generates synthetic registers from 10 up to
+# 1,000,000 students and times loading, saving, sorting, the highest score, search and filling the
+# table, all without showing a window. Results come out as JSON so two runs can be compared:
+#
+#   python student_bench.py                                   every size, JSON to stdout
+#   python student_bench.py --sizes 10 1000 --out run.json    just these sizes, saved to a file
+#   python student_bench.py --compare base.json run.json      list operations that got slower
+#
+# The table fill needs Tk. It runs under a withdrawn root (or under Xvfb on a server) and is
+# reported as skipped when there's no display at all
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from student_core import load_numpy, load_students, percentile, save_snapshot, save_students, snapshot_path
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+ROW_BUDGET = 2000000  # Rows a single operation gets through in total, so big sizes repeat fewer times
+MIN_REPEAT = 3
+MAX_REPEAT = 50
+TREE_FILL_MAX = 100000  # Filling a Treeview with every row gets slow fast, so the full fill stops here
+VISIBLE_ROWS = 25  # About one screen of the virtual table
+SEARCH_TERMS = 20  # Different terms per search timing, half names and half IDs
+REGRESSION_RATIO = 1.2  # --compare flags anything whose p50 grew by more than this
+NOISE_FLOOR_MS = 0.05  # ...and by more than this, as microsecond timings jitter far more than 20%
+
+FIRST_NAMES = ("Amelia", "Ben", "Chloe", "Dev", "Ella", "Finn", "Grace", "Harry", "Isla", "Jake",
+               "Kai", "Lily", "Mo", "Nina", "Oscar", "Priya", "Quinn", "Ruby", "Sam", "Tara")
+LAST_NAMES = ("Ahmed", "Brown", "Curry", "Davies", "Evans", "Fox", "Green", "Hyde", "Iqbal", "Jones",
+              "Khan", "Lee", "Moore", "Nash", "Owen", "Patel", "Reid", "Smith", "Taylor", "Wood")
+
+def generate_register(path, rows, seed=0):
+    # A studentMarks.txt with rows made-up students, the same every time for the same seed
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{rows}\n")
+        for code in range(1000, 1000 + rows):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            f.write(f"{code},{name},{rng.randint(0, 20)},{rng.randint(0, 20)},{rng.randint(0, 20)},"
+                    f"{rng.randint(0, 100)}\n")
+
+def repeats_for(rows, per_call_rows):
+    # per_call_rows is how many rows one call touches (the whole register, or just a page)
+    return max(MIN_REPEAT, min(MAX_REPEAT, ROW_BUDGET // max(1, per_call_rows)))
+
+def measure(operation, rows, repeat, run, setup=None):
+    # Time run() repeat times (setup() first each time, untimed), then once more under tracemalloc
+    # for the peak memory, since tracing would skew the timings themselves
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    p50 = percentile(timings, 50)
+    result = {
+        "rows": rows,
+        "operation": operation,
+        "repeat": repeat,
+        "p50_ms": round(p50 * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "rows_per_sec": round(rows / p50) if p50 > 0 else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+    print(f"{rows:>9,} {operation:<15} p50 {result['p50_ms']:>10.3f} ms  p99 {result['p99_ms']:>10.3f} ms  "
+          f"peak {result['peak_kb']:>11,.1f} KB", file=sys.stderr)
+    return result
+
+def open_tree():
+    # A withdrawn root with a Treeview laid out like the app's table, or None without a display
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception:  # No tkinter, or TclError: no display
+        return None, None
+    root.withdraw()
+    tree = ttk.Treeview(root, columns=("code", "name", "coursework", "exam", "percentage", "grade"),
+                        show="headings")
+    return root, tree
+
+def row_values(student):
+    # The same values the app puts in each table row
+    return (student.code, student.name, student.coursework_total, student.exam_mark,
+            f"{student.percentage:.1f}%", student.grade)
+
+def bench_size(rows, workdir, tree):
+    path = os.path.join(workdir, f"students_{rows}.txt")
+    generate_register(path, rows)
+    whole = repeats_for(rows, rows)
+    results = []
+
+    def clear_snapshot():
+        if os.path.exists(snapshot_path(path)):
+            os.remove(snapshot_path(path))
+
+    # Loading: the text file first, then the binary snapshot the app prefers when it's fresh
+    results.append(measure("load_text", rows, whole,
+                           lambda: load_students(path, replay_journal=False, parallel=False),
+                           setup=clear_snapshot))
+    store = load_students(path, replay_journal=False, parallel=False)
+    students = store.as_list()
+    save_snapshot(path, students)
+    results.append(measure("load_snapshot", rows, whole, lambda: load_students(path, replay_journal=False)))
+
+    save_path = os.path.join(workdir, "save.txt")
+    results.append(measure("save", rows, whole, lambda: save_students(save_path, students)))
+
+    # Sorting fetches the first screen of the score ordering, the way sort_records does
+    page = repeats_for(rows, VISIBLE_ROWS)
+    results.append(measure("sort", rows, page, lambda: store.by_total(reverse=True)[0:VISIBLE_ROWS]))
+    results.append(measure("highest_score", rows, page, lambda: store.extreme_scores(True)))
+
+    rng = random.Random(rows)
+    terms = [rng.choice(FIRST_NAMES)[1:4] if i % 2 else rng.choice(students).code for i in range(SEARCH_TERMS)]
+    results.append(measure("search", rows, page, lambda: [store.search(term) for term in terms]))
+
+    # A write has to keep every index in step, which is what the edit dialogs pay per change
+    victim = students[len(students) // 2]
+    results.append(measure("update", rows, page,
+                           lambda: store.update(victim.code, 'exam_mark', rng.randint(0, 100))))
+
+    if tree is None:
+        results.append({"rows": rows, "operation": "tree_fill", "skipped": "no display"})
+        results.append({"rows": rows, "operation": "tree_page", "skipped": "no display"})
+        return results
+
+    # The full fill is what the table cost before it went virtual; the page refill is what it costs now
+    fill_rows = students[:TREE_FILL_MAX]
+
+    def clear_tree():
+        tree.delete(*tree.get_children())
+
+    def fill():
+        for student in fill_rows:
+            tree.insert("", "end", values=row_values(student))
+        tree.update_idletasks()
+
+    results.append(measure("tree_fill", len(fill_rows), MIN_REPEAT, fill, setup=clear_tree))
+
+    clear_tree()
+    items = [tree.insert("", "end", values=row_values(s)) for s in students[:VISIBLE_ROWS]]
+    offsets = itertools.cycle(range(0, max(1, len(students) - VISIBLE_ROWS), VISIBLE_ROWS))
+
+    def refill():
+        top = next(offsets)
+        for item, student in zip(items, students[top:top + VISIBLE_ROWS]):
+            tree.item(item, values=row_values(student))
+        tree.update_idletasks()
+
+    results.append(measure("tree_page", rows, page, refill))
+    clear_tree()
+    return results
+
+def compare(base_path, new_path, ratio):
+    # Print every operation whose p50 got more than ratio times slower. Returns 1 if any did
+    def timings(path):
+        with open(path, "r", encoding="utf-8") as f:
+            run = json.load(f)
+        return {(r["rows"], r["operation"]): r["p50_ms"] for r in run["results"] if "p50_ms" in r}
+
+    base, new = timings(base_path), timings(new_path)
+    regressions = 0
+    for key in sorted(base.keys() & new.keys()):
+        before, after = base[key], new[key]
+        change = after / before if before else float("inf")
+        flag = ""
+        if change > ratio and after - before > NOISE_FLOOR_MS:
+            flag = "  <-- slower"
+            regressions += 1
+        print(f"{key[0]:>9,} {key[1]:<15} {before:>10.3f} ms -> {after:>10.3f} ms  {change:5.2f}x{flag}")
+    print(f"{regressions} regression{'s' if regressions != 1 else ''} over {ratio:.2f}x")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Student Manager's data paths on synthetic registers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="register sizes to run")
+    parser.add_argument("--out", help="write the JSON results here instead of stdout")
+    parser.add_argument("--no-tk", action="store_true", help="skip the table fill timings")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two saved runs")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO, help="slowdown --compare reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, args.ratio)
+
+    root, tree = (None, None) if args.no_tk else open_tree()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for rows in args.sizes:
+                results.extend(bench_size(rows, workdir, tree))
+    finally:
+        if root is not None:
+            root.destroy()
+
+    run = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": load_numpy() is not None,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    else:
+        json.dump(run, sys.stdout, indent=2)
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
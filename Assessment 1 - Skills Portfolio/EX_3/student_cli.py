@@ -0,0 +1,182 @@
+# Command line front end for the Student Manager, for batch jobs on machines without a display.
+# Everything streams through student_core, so memory stays flat however big the register is:
+#
+#   python student_cli.py import new_students.csv      add students from a CSV file
+#   python student_cli.py export graded.csv            write every student with totals and grade
+#   python student_cli.py top 10 [--lowest]            best (or worst) students by overall total
+#   python student_cli.py grades                       head count per grade
+#   python student_cli.py compact                      fold the app's journal into studentMarks.txt
+#   python student_cli.py snapshot                     (re)build the binary studentMarks.bin
+#   python student_cli.py bench-parse [--workers N]    time a serial parse against a parallel one
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import time
+
+from student_core import (GRADES, JOURNAL_SUFFIX, StudentJournal, export_graded, grade_counts, graded_row,
+                          iter_csv_students, iter_student_chunks, iter_students, iter_students_parallel,
+                          load_students, read_header_count, save_snapshot, save_students, snapshot_path,
+                          top_students)
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "studentMarks.txt")
+
+def pending_journal(data_path):
+    return StudentJournal(data_path + JOURNAL_SUFFIX).pending()
+
+def warn_if_journal(data_path):
+    # The streaming commands read studentMarks.txt as it is on disk
+    if pending_journal(data_path):
+        print("Warning: unsaved app changes are still in the journal and are not included; "
+              "run 'compact' first to fold them in.", file=sys.stderr)
+
+def cmd_import(args):
+    if pending_journal(args.data):
+        print("Error: run 'compact' before importing so journalled changes aren't lost.", file=sys.stderr)
+        return 1
+
+    # Stream the current register and then the new rows into a body file, counting as we go,
+    # then put the count header in front of it. Only the student IDs are kept in memory
+    codes = set()
+    added = skipped = 0
+    body_path = args.data + ".import"
+    tmp_path = args.data + ".tmp"
+    try:
+        with open(body_path, "w", encoding="utf-8") as body:
+            if os.path.exists(args.data):
+                for student in iter_students(args.data):
+                    if student.code not in codes:
+                        codes.add(student.code)
+                        body.write(student.to_record() + "\n")
+            for student in iter_csv_students(args.csv):
+                if student is None or student.code in codes:
+                    skipped += 1  # Malformed lines (a header row included) and duplicate IDs
+                    continue
+                codes.add(student.code)
+                body.write(student.to_record() + "\n")
+                added += 1
+
+        with open(tmp_path, "w", encoding="utf-8") as out, open(body_path, "r", encoding="utf-8") as body:
+            out.write(f"{len(codes)}\n")
+            shutil.copyfileobj(body, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, args.data)
+    finally:
+        # Neither file is any use once the import has finished or failed
+        for leftover in (body_path, tmp_path):
+            with contextlib.suppress(OSError):
+                os.remove(leftover)
+    print(f"Imported {added} students ({skipped} lines skipped), {len(codes)} in total")
+    return 0
+
+def cmd_export(args):
+    warn_if_journal(args.data)
+    count = export_graded(args.out, iter_students(args.data))
+    print(f"Exported {count} students to {args.out}")
+    return 0
+
+def cmd_top(args):
+    warn_if_journal(args.data)
+    for student in top_students(iter_students(args.data), args.n, highest=not args.lowest):
+        code, name, coursework, exam, total, percentage, grade = graded_row(student)
+        print(f"{code:<8} {name:<30} {total:>4} {percentage:>6}% {grade}")
+    return 0
+
+def cmd_grades(args):
+    warn_if_journal(args.data)
+    counts, total, average = grade_counts(iter_students(args.data))
+    for grade in GRADES:
+        print(f"{grade}: {counts[grade]}")
+    print(f"Students: {total}, average {average:.1f}%")
+    return 0
+
+def cmd_compact(args):
+    # This one does load the whole register, the same as the app does when it compacts
+    if not pending_journal(args.data):
+        print("Nothing to compact")
+        return 0
+    store = load_students(args.data)
+    save_students(args.data, store)
+    # The text file has everything now, so the journal goes before the (optional) snapshot
+    StudentJournal(args.data + JOURNAL_SUFFIX).clear()
+    print(f"Compacted {len(store)} students into {args.data}")
+    try:
+        save_snapshot(args.data, store)
+    except ValueError as e:
+        print(f"Warning: no snapshot written: {e}", file=sys.stderr)
+    return 0
+
+def cmd_snapshot(args):
+    warn_if_journal(args.data)
+    # Two streaming passes, one to count and one to write, so the register never sits in memory
+    count = sum(1 for _ in iter_students(args.data))
+    save_snapshot(args.data, iter_students(args.data), count)
+    print(f"Wrote {count} students to {snapshot_path(args.data)}")
+    return 0
+
+def cmd_bench_parse(args):
+    # Both runs parse the text file (never the snapshot) and build every Student
+    def serial():
+        with open(args.data, "r", encoding="utf-8") as file:
+            read_header_count(file)
+            return sum(len(chunk) for chunk in iter_student_chunks(file, 2000))
+
+    def parallel():
+        return sum(len(chunk) for chunk in iter_students_parallel(args.data, workers=args.workers))
+
+    timings = {}
+    for name, parse in (("serial", serial), ("parallel", parallel)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            count = parse()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        print(f"{name:<9} {count:,} students in {best:.3f}s ({count / best:,.0f} rows/sec)")
+    print(f"Speedup: {timings['serial'] / timings['parallel']:.2f}x with {args.workers or os.cpu_count()} workers")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch tools for the Student Manager register")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="register file (default: studentMarks.txt next to this script)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="add students from a CSV of code,name,m1,m2,m3,exam")
+    p.add_argument("csv")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("export", help="write every student with totals, percentage and grade to CSV")
+    p.add_argument("out")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("top", help="show the N highest (or lowest) overall totals")
+    p.add_argument("n", type=int)
+    p.add_argument("--lowest", action="store_true")
+    p.set_defaults(func=cmd_top)
+
+    p = commands.add_parser("grades", help="count students per grade")
+    p.set_defaults(func=cmd_grades)
+
+    p = commands.add_parser("compact", help="fold the app's journal into the register")
+    p.set_defaults(func=cmd_compact)
+
+    p = commands.add_parser("snapshot", help="write the binary snapshot the app loads fastest")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = commands.add_parser("bench-parse", help="time parsing the text register serially and across processes")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    p.add_argument("--repeat", type=int, default=3, help="runs of each, the best is reported")
+    p.set_defaults(func=cmd_bench_parse)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
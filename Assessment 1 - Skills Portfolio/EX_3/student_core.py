@@ -0,0 +1,964 @@
+# The GUI-free core of the Student Manager: the Student record, the StudentStore and its indexes,
+# cohort statistics, and reading/writing studentMarks.txt. Nothing in here imports tkinter, so batch
+# jobs and the command line tool (student_cli.py) can use it on headless servers and start up fast
+import array
+import bisect
+import contextlib
+import csv
+import heapq
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+# NumPy is optional - with it the cohort statistics run as vectorised array maths,
+# without it we just loop over the Student objects like before. Importing it takes a
+# good part of a second, so it's only loaded the first time the statistics need it
+_numpy = None
+
+JOURNAL_SUFFIX = ".journal"  # The write-ahead journal sits next to the register as studentMarks.txt.journal
+STATS_PERCENTILES = (25, 50, 75, 90)
+GRADES = "ABCDF"
+EXPORT_HEADER = ("code", "name", "coursework", "exam", "total", "percentage", "grade")
+BULK_REBUILD_MIN = 64  # Batches bigger than this rebuild the sorted orderings once instead of bisecting per item
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # Registers smaller than this parse faster in one process than spread out
+PARALLEL_RANGE_BYTES = 4 * 1024 * 1024  # Each worker task parses about this much of the file
+
+# Binary snapshot (studentMarks.bin): a header, one fixed-width record per student and a string table.
+#   header: magic, version, spare, student count, records offset, string table offset
+#   record: offset of the code in the string table, code length, name length (the name follows the code),
+#           then the three course marks and the exam mark as 32-bit ints
+# Marks are never range checked, so a register with one that won't fit just doesn't get a snapshot
+SNAPSHOT_MAGIC = b"SMB1"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct("<4sHHIQQ")
+SNAPSHOT_RECORD = struct.Struct("<IHHiiii")
+
+# What each table column sorts on
+SORT_KEYS = {
+    "code": lambda s: s.code,
+    "name": lambda s: s.name.lower(),
+    "coursework": lambda s: s.coursework_total,
+    "exam": lambda s: s.exam_mark,
+    "percentage": lambda s: s.overall_total,
+    "grade": lambda s: s.grade,
+}
+# Which table columns move when a given Student field is edited
+FIELD_COLUMNS = {
+    "code": ("code",),
+    "name": ("name",),
+    "course_marks": ("coursework", "percentage", "grade"),
+    "exam_mark": ("exam", "percentage", "grade"),
+}
+
+class Student:
+    # This class holds all the information about a single student
+    # including their ID, name, marks from three courses, and their exam score.
+    # __slots__ keeps each record small, and the totals, percentage and grade are worked out
+    # once when a mark changes instead of every time something asks for them
+    __slots__ = ("code", "name", "_course_marks", "_exam_mark",
+                 "coursework_total", "overall_total", "percentage", "grade")
+
+    def __init__(self, code, name, mark1, mark2, mark3, exam_mark):
+        self.code = code
+        self.name = name
+        self._course_marks = (mark1, mark2, mark3)
+        self._exam_mark = exam_mark
+        self._recalculate()
+
+    @property
+    def course_marks(self):
+        # A tuple, so marks can only change through the setters below and the cache can't go stale
+        return self._course_marks
+
+    @course_marks.setter
+    def course_marks(self, marks):
+        self._course_marks = tuple(marks)
+        self._recalculate()
+
+    @property
+    def exam_mark(self):
+        return self._exam_mark
+
+    @exam_mark.setter
+    def exam_mark(self, mark):
+        self._exam_mark = mark
+        self._recalculate()
+
+    def _recalculate(self):
+        self.coursework_total = sum(self._course_marks)
+        self.overall_total = self.coursework_total + self._exam_mark
+        self.percentage = (self.overall_total / 160) * 100
+        if self.percentage >= 70: self.grade = 'A'
+        elif self.percentage >= 60: self.grade = 'B'
+        elif self.percentage >= 50: self.grade = 'C'
+        elif self.percentage >= 40: self.grade = 'D'
+        else: self.grade = 'F'
+        
+    def get_total_coursework(self):
+        return self.coursework_total
+    
+    def get_overall_total(self):
+        return self.overall_total
+    
+    def get_percentage(self):
+        return self.percentage
+    
+    def get_grade(self):
+        return self.grade
+
+    def to_record(self):
+        # The same comma separated layout used by every line of studentMarks.txt
+        return f"{self.code},{self.name},{self.course_marks[0]},{self.course_marks[1]},{self.course_marks[2]},{self.exam_mark}"
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+def parse_student_fields(line):
+    # Turns one "code,name,m1,m2,m3,exam" line into a (code, name, m1, m2, m3, exam) tuple,
+    # or None if the line is malformed
+    parts = line.strip().split(',')
+    if len(parts) != 6:
+        return None
+    try:
+        return (parts[0].strip(), parts[1].strip(),
+                int(parts[2]), int(parts[3]), int(parts[4]), int(parts[5]))
+    except ValueError:
+        return None
+
+def parse_student_record(line):
+    # The same as parse_student_fields, but as a Student
+    fields = parse_student_fields(line)
+    return Student(*fields) if fields is not None else None
+
+def iter_student_chunks(lines, chunk_size):
+    # Lazily parse an open file (or any iterable of lines) into lists of at most chunk_size students,
+    # so the whole file never has to be read into memory at once
+    while True:
+        block = list(itertools.islice(lines, chunk_size))
+        if not block:
+            return
+        chunk = []
+        for line in block:
+            student = parse_student_record(line)
+            if student is not None:
+                chunk.append(student)
+        yield chunk
+
+class StudentStore:
+    # Keeps every student in the order they were added, with a dictionary index on the student code
+    # so finding, adding, removing and renaming a student never has to walk the whole register
+    def __init__(self, students=()):
+        self._rows = {}    # row number -> Student, dicts keep insertion order for us
+        self._index = {}   # student code -> row number
+        self._by_total = []  # (overall total, row number) kept sorted with bisect for score ordering
+        self._column_orders = {}  # table column -> sorted (sort key, row number), built on first use
+        self._multi_orders = {}  # multi-column sort spec -> students in that order
+        self._lower_names = {}  # row number -> name already lowercased, so searches never call lower() per student
+        self._trigrams = {}  # three letter chunk of a lowercased name -> rows whose name contains it
+        self._bulk = 0  # How many bulk() blocks we're inside; the sorted orderings wait for the last to end
+        self._next_row = 0
+        self._list = None  # Cached list of students in order, rebuilt only after a change
+        self._columns = None  # Cached StudentColumns, also rebuilt only after a change
+        with self.bulk():
+            for student in students:
+                self.add(student)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def as_list(self):
+        # A plain list in display order so the table can slice out just the rows it needs
+        if self._list is None:
+            self._list = list(self._rows.values())
+        return self._list
+
+    def get(self, code):
+        row = self._index.get(code)
+        if row is None:
+            return None
+        return self._rows[row]
+
+    def add(self, student):
+        if student.code in self._index:
+            raise KeyError(f"Student ID {student.code} already exists")
+        self._rows[self._next_row] = student
+        self._index[student.code] = self._next_row
+        self._index_orders(student, self._next_row)
+        self._next_row += 1
+        self._multi_orders.clear()
+        self._changed()
+
+    def remove(self, code):
+        row = self._index.pop(code)
+        student = self._rows.pop(row)
+        self._unindex_orders(student, row)
+        self._multi_orders.clear()
+        self._changed()
+        return student
+
+    def _index_orders(self, student, row, columns=None):
+        # Slot the student into the score index and every column ordering built so far.
+        # columns limits this to the orderings a particular field change actually affects
+        if not self._bulk:
+            if columns is None or "percentage" in columns:
+                bisect.insort(self._by_total, (student.overall_total, row))
+            for column, entries in self._column_orders.items():
+                if columns is None or column in columns:
+                    bisect.insort(entries, (SORT_KEYS[column](student), row))
+        if columns is None or "name" in columns:
+            lower = student.name.lower()
+            self._lower_names[row] = lower
+            for gram in name_trigrams(lower):
+                self._trigrams.setdefault(gram, set()).add(row)
+
+    def _unindex_orders(self, student, row, columns=None):
+        if not self._bulk:
+            if columns is None or "percentage" in columns:
+                del self._by_total[bisect.bisect_left(self._by_total, (student.overall_total, row))]
+            for column, entries in self._column_orders.items():
+                if columns is None or column in columns:
+                    del entries[bisect.bisect_left(entries, (SORT_KEYS[column](student), row))]
+        if columns is None or "name" in columns:
+            for gram in name_trigrams(self._lower_names.pop(row)):
+                rows = self._trigrams[gram]
+                rows.discard(row)
+                if not rows:
+                    del self._trigrams[gram]
+
+    def _touch(self, columns):
+        # Forget only the multi-column orderings that sort on something that just changed
+        for spec in [spec for spec in self._multi_orders if any(c in columns for c, _ in spec)]:
+            del self._multi_orders[spec]
+
+    def rename(self, old_code, new_code):
+        # Changing the ID only moves the index entry, the student keeps its place in the list
+        if old_code not in self._index:
+            raise KeyError(f"Student ID {old_code} doesn't exist")
+        if old_code == new_code:
+            return self.get(old_code)
+        if new_code in self._index:
+            raise KeyError(f"Student ID {new_code} already exists")
+        row = self._index.pop(old_code)
+        student = self._rows[row]
+        columns = FIELD_COLUMNS['code']
+        self._unindex_orders(student, row, columns)
+        student.code = new_code
+        self._index[new_code] = row
+        self._index_orders(student, row, columns)
+        self._touch(columns)
+        self._changed()
+        return student
+
+    def put(self, student):
+        # Add a new student, or swap in the new details for an existing ID without moving its row
+        row = self._index.get(student.code)
+        if row is None:
+            self.add(student)
+        else:
+            self._unindex_orders(self._rows[row], row)
+            self._rows[row] = student
+            self._index_orders(student, row)
+            self._multi_orders.clear()
+            self._changed()
+
+    def update(self, code, attr_name, value):
+        # Single place to change a student field so the code index can never go stale
+        if attr_name == 'code':
+            return self.rename(code, value)
+        row = self._index.get(code)
+        if row is None:
+            raise KeyError(f"Student ID {code} doesn't exist")
+        student = self._rows[row]
+        # Take the student out of just the orderings this field feeds, then put it back in its new spot
+        columns = FIELD_COLUMNS.get(attr_name, ())
+        self._unindex_orders(student, row, columns)
+        setattr(student, attr_name, value)
+        self._index_orders(student, row, columns)
+        self._touch(columns)
+        self._changed()
+        return student
+
+    @contextlib.contextmanager
+    def bulk(self):
+        # Inside this block the score index and column orderings aren't kept up item by item.
+        # They're rebuilt once on the way out of the outermost block, which beats thousands of
+        # bisect inserts. The orderings are stale until then, so nothing should sort or rank meanwhile
+        self._bulk += 1
+        try:
+            yield self
+        finally:
+            self._bulk -= 1
+            if not self._bulk:
+                self._by_total = sorted((s.overall_total, row) for row, s in self._rows.items())
+                self._column_orders = {}
+                self._multi_orders = {}
+                self._changed()
+
+    def _batch(self, size):
+        return self.bulk() if size > BULK_REBUILD_MIN else contextlib.nullcontext()
+
+    def add_many(self, students):
+        # Add a batch of students in one go. Returns the journal changes for what went in and a
+        # list of problems (duplicate IDs) instead of stopping at the first one
+        students = list(students)
+        changes, errors = [], []
+        with self._batch(len(students)):
+            for student in students:
+                if student.code in self._index:
+                    errors.append(f"{student.code}: Student ID already exists")
+                    continue
+                self.add(student)
+                changes.append(("+", student.to_record()))
+        return changes, errors
+
+    def remove_many(self, codes):
+        codes = list(codes)
+        changes, errors = [], []
+        with self._batch(len(codes)):
+            for code in codes:
+                if code not in self._index:
+                    errors.append(f"{code}: no such student")
+                    continue
+                self.remove(code)
+                changes.append(("-", code))
+        return changes, errors
+
+    def update_many(self, updates):
+        # updates is an iterable of (code, field, new value), applied in order
+        updates = list(updates)
+        changes, errors = [], []
+        with self._batch(len(updates)):
+            for code, attr_name, value in updates:
+                try:
+                    student = self.update(code, attr_name, value)
+                except KeyError:
+                    errors.append(f"{code}: no such student, or the new ID is already taken")
+                    continue
+                if attr_name == 'code':
+                    changes.append((">", code, value))
+                else:
+                    changes.append(("+", student.to_record()))
+        return changes, errors
+
+    def _changed(self):
+        self._list = None
+        self._columns = None
+
+    def columns(self):
+        # Column-oriented copy of the register, or None when NumPy isn't installed (or a mark is
+        # too big for a 64-bit int, which the plain Python statistics still cope with)
+        if load_numpy() is None:
+            return None
+        if self._columns is None:
+            try:
+                self._columns = StudentColumns(self.as_list())
+            except OverflowError:
+                return None
+        return self._columns
+
+    def search(self, term):
+        # An exact ID match first, then every student whose name contains the term (any case),
+        # in register order. Names of three letters or more are narrowed down with the trigram
+        # index so only a handful of names ever get checked
+        exact = self.get(term)
+        matches = [exact] if exact else []
+        term = term.lower()
+        grams = name_trigrams(term)
+        if grams:
+            candidate_sets = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+            rows = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+            # Sharing trigrams doesn't guarantee they're next to each other, so confirm the match
+            rows = sorted(row for row in rows if term in self._lower_names[row])
+        else:
+            rows = sorted(row for row, name in self._lower_names.items() if term in name)
+        matches.extend(self._rows[row] for row in rows if self._rows[row] is not exact)
+        return matches
+
+    def search_prefix(self, prefix):
+        # Names starting with prefix, alphabetically, straight off the name ordering with bisect
+        entries = self.ordered((("name", False),)).entries
+        prefix = prefix.lower()
+        start = bisect.bisect_left(entries, (prefix,))
+        matches = []
+        for name, row in itertools.islice(entries, start, None):
+            if not name.startswith(prefix):
+                break
+            matches.append(self._rows[row])
+        return matches
+
+    def by_total(self, reverse=False):
+        # Every student ordered by overall total, read straight off the score index without sorting
+        return OrderView(self, self._by_total, reverse)
+
+    def ordered(self, spec):
+        # spec is a tuple of (column, descending) pairs, most significant first
+        if len(spec) == 1:
+            # Single columns come from a bisect-maintained ordering, flipped for descending
+            column, descending = spec[0]
+            if column == "percentage":
+                entries = self._by_total
+            else:
+                entries = self._column_orders.get(column)
+                if entries is None:
+                    key = SORT_KEYS[column]
+                    entries = sorted((key(s), row) for row, s in self._rows.items())
+                    self._column_orders[column] = entries
+            return OrderView(self, entries, descending)
+
+        # Multi-column orders are sorted once with stable passes (least significant first) and cached
+        ordered = self._multi_orders.get(spec)
+        if ordered is None:
+            ordered = list(self._rows.values())
+            for column, descending in reversed(spec):
+                ordered.sort(key=SORT_KEYS[column], reverse=descending)
+            self._multi_orders[spec] = ordered
+        return ordered
+
+    def top_k(self, k):
+        return [self._rows[row] for _, row in reversed(self._by_total[-k:])] if k > 0 else []
+
+    def bottom_k(self, k):
+        return [self._rows[row] for _, row in self._by_total[:k]]
+
+    def extreme_scores(self, highest=True):
+        # Every student tied on the highest (or lowest) overall total, along with that total.
+        # Both ends of the score index are one bisect away, so this doesn't depend on class size
+        if not self._by_total:
+            return None, []
+        if highest:
+            score = self._by_total[-1][0]
+            start = bisect.bisect_left(self._by_total, (score,))
+            tied = self._by_total[start:]
+        else:
+            score = self._by_total[0][0]
+            end = bisect.bisect_left(self._by_total, (score + 1,))
+            tied = self._by_total[:end]
+        return score, [self._rows[row] for _, row in tied]
+
+    def stats(self):
+        columns = self.columns()
+        if columns is not None:
+            return columns.stats()
+        return cohort_stats(self.as_list())
+
+def name_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class OrderView:
+    # A read-only sequence over one of the store's sorted (key, row) orderings. The table only ever
+    # slices out the rows on screen, so showing a sorted register costs the viewport, not the class
+    def __init__(self, store, entries, reverse=False):
+        self.store = store
+        self.entries = entries
+        self.reverse = reverse
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, item):
+        entries = self.entries
+        count = len(entries)
+        if isinstance(item, slice):
+            start, stop, step = item.indices(count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if self.reverse:
+                picked = entries[count - stop:count - start][::-1] if start < stop else []
+            else:
+                picked = entries[start:stop]
+            return [self.store._rows[row] for _, row in picked]
+        if item < 0:
+            item += count
+        if not 0 <= item < count:
+            raise IndexError("order index out of range")
+        if self.reverse:
+            item = count - 1 - item
+        return self.store._rows[entries[item][1]]
+
+    def __iter__(self):
+        rows = self.store._rows
+        entries = reversed(self.entries) if self.reverse else self.entries
+        return (rows[row] for _, row in entries)
+
+def percentile(sorted_values, q):
+    # Linear interpolation between the closest ranks, the same as NumPy's default
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def cohort_stats(students):
+    # Plain Python version of the cohort statistics, used when NumPy isn't available
+    totals = sorted(s.overall_total for s in students)
+    percentages = [t / 160 * 100 for t in totals]
+    grade_counts = dict.fromkeys(GRADES, 0)
+    histogram = [0] * 10
+    for s in students:
+        grade_counts[s.grade] += 1
+        if 0 <= s.percentage <= 100:
+            histogram[min(int(s.percentage // 10), 9)] += 1
+    count = len(totals)
+    return {
+        "count": count,
+        "min_total": totals[0] if totals else 0,
+        "max_total": totals[-1] if totals else 0,
+        "mean_total": sum(totals) / count if count else 0.0,
+        "mean_percentage": sum(percentages) / count if count else 0.0,
+        "percentiles": {q: percentile(percentages, q) for q in STATS_PERCENTILES},
+        "grade_counts": grade_counts,
+        "histogram": histogram,
+    }
+
+def load_numpy():
+    # The numpy module, or None if it isn't installed. Imported on the first call only
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+class StudentColumns:
+    # The register laid out column by column for cohort-wide maths. The four marks live in one
+    # int64 array, so totals, grades, extremes and statistics are single vectorised operations
+    def __init__(self, students):
+        np = load_numpy()
+        self.students = list(students)
+        self.marks = np.array([(*s.course_marks, s.exam_mark) for s in self.students],
+                              dtype=np.int64).reshape(-1, 4)
+        self.totals = self.marks.sum(axis=1)
+        self.percentages = self.totals / 160 * 100
+        p = self.percentages
+        self.grades = np.select([p >= 70, p >= 60, p >= 50, p >= 40], ["A", "B", "C", "D"], "F")
+
+    def stats(self):
+        count = len(self.students)
+        if not count:
+            return cohort_stats([])
+        np = load_numpy()
+        grades, grade_totals = np.unique(self.grades, return_counts=True)
+        grade_counts = dict.fromkeys(GRADES, 0)
+        grade_counts.update(zip(grades.tolist(), grade_totals.tolist()))
+        histogram, _ = np.histogram(self.percentages, bins=10, range=(0, 100))
+        percentiles = np.percentile(self.percentages, STATS_PERCENTILES)
+        return {
+            "count": count,
+            "min_total": int(self.totals.min()),
+            "max_total": int(self.totals.max()),
+            "mean_total": float(self.totals.mean()),
+            "mean_percentage": float(self.percentages.mean()),
+            "percentiles": dict(zip(STATS_PERCENTILES, percentiles.tolist())),
+            "grade_counts": grade_counts,
+            "histogram": histogram.tolist(),
+        }
+
+class StudentJournal:
+    # A write-ahead log that sits next to studentMarks.txt. Each change is one appended line:
+    #   +,code,name,m1,m2,m3,exam   add or replace a whole record
+    #   -,code                      delete a record
+    #   >,old_code,new_code         change a student ID
+    # The main file is only ever replaced as a whole, so a crash can at worst lose the last half written line here.
+    # While a background save is running, the lines it covers are moved aside to <path>.compacting
+    # so that changes made during the save carry on into a fresh journal
+    def __init__(self, path):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.records = 0
+
+    def pending(self):
+        return os.path.exists(self.path) or os.path.exists(self.compacting_path)
+
+    def append(self, op, *fields):
+        self.append_many([(op,) + fields])
+
+    def append_many(self, entries):
+        # Write a batch of (op, field, ...) changes with a single open and fsync
+        lines = "".join(",".join(entry) + "\n" for entry in entries)
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records += lines.count("\n")
+
+    def replay(self, store):
+        # Re-apply every complete journal line on top of what was loaded from the main file
+        self.apply(store, self.read_changes())
+        return self.records
+
+    def read_changes(self):
+        # Parse the journal into ("+", Student), ("-", code) and (">", old_code, new_code) changes,
+        # oldest first. This is the file reading half of replay, so it can run off the UI thread
+        changes = []
+        self.records = 0
+        # A save that never finished left its lines in the compacting file, and they come first
+        for path in (self.compacting_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # Torn write from a crash, nothing after it can be trusted
+                    op, _, rest = line.rstrip("\n").partition(",")
+                    if op == "+":
+                        student = parse_student_record(rest)
+                        if student is not None:
+                            changes.append(("+", student))
+                    elif op == "-":
+                        changes.append(("-", rest))
+                    elif op == ">":
+                        old_code, _, new_code = rest.partition(",")
+                        changes.append((">", old_code, new_code))
+                    self.records += 1
+        return changes
+
+    @staticmethod
+    def apply(store, changes):
+        # Changes that no longer apply (e.g. deleting an ID that is already gone) are skipped,
+        # so replaying twice after an interrupted compaction gives the same result
+        for change in changes:
+            op = change[0]
+            if op == "+":
+                store.put(change[1])
+            elif op == "-":
+                if change[1] in store:
+                    store.remove(change[1])
+            else:
+                old_code, new_code = change[1:]
+                if old_code in store and new_code not in store:
+                    store.rename(old_code, new_code)
+
+    def begin_compaction(self):
+        # Move everything journalled so far aside for the save that's about to start.
+        # If an earlier save failed its lines are still there, so ours are added after them
+        if os.path.exists(self.path):
+            if os.path.exists(self.compacting_path):
+                with open(self.path, "r", encoding="utf-8") as src, open(self.compacting_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.compacting_path)
+        self.records = 0
+
+    def end_compaction(self):
+        # The save made it to disk, so the lines it covered are no longer needed
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def clear(self):
+        for path in (self.path, self.compacting_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.records = 0
+
+class StudentSnapshot:
+    # Read-only view of a binary snapshot opened with mmap. Nothing is decoded up front - a
+    # record only becomes a Student when it's indexed, iterated or pulled out in a chunk
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, self.count, self._records, self._strings = SNAPSHOT_HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} is not a student snapshot")
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a student snapshot")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self._decode(SNAPSHOT_RECORD.unpack_from(self._map, self._records + i * SNAPSHOT_RECORD.size))
+
+    def __iter__(self):
+        for chunk in self.iter_chunks(2000):
+            yield from chunk
+
+    def _decode(self, record):
+        offset, code_len, name_len, m1, m2, m3, exam = record
+        start = self._strings + offset
+        code = self._map[start:start + code_len].decode("utf-8")
+        name = self._map[start + code_len:start + code_len + name_len].decode("utf-8")
+        return Student(code, name, m1, m2, m3, exam)
+
+    def iter_chunks(self, chunk_size):
+        # Same shape as iter_student_chunks, but each chunk is a straight unpack of packed records
+        size = SNAPSHOT_RECORD.size
+        for first in range(0, self.count, chunk_size):
+            last = min(first + chunk_size, self.count)
+            block = self._map[self._records + first * size:self._records + last * size]
+            yield [self._decode(record) for record in SNAPSHOT_RECORD.iter_unpack(block)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + ".bin"
+
+def snapshot_is_fresh(path):
+    # Only trust the snapshot when nothing has touched the text file since it was written
+    snap = snapshot_path(path)
+    if not os.path.exists(snap):
+        return False
+    if not os.path.exists(path):
+        return True
+    return os.stat(snap).st_mtime_ns >= os.stat(path).st_mtime_ns
+
+def save_snapshot(path, students, count=None):
+    # Write the snapshot for a register to a temporary file and swap it in, like save_students.
+    # A student that doesn't fit the record layout raises ValueError and leaves the old snapshot be
+    if count is None:
+        count = len(students)
+    records_offset = SNAPSHOT_HEADER.size
+    strings_offset = records_offset + count * SNAPSHOT_RECORD.size
+    strings = bytearray()
+    written = 0
+    tmp_path = snapshot_path(path) + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, count, records_offset, strings_offset))
+            for s in students:
+                code = s.code.encode("utf-8")
+                name = s.name.encode("utf-8")
+                try:
+                    f.write(SNAPSHOT_RECORD.pack(len(strings), len(code), len(name), *s.course_marks, s.exam_mark))
+                except struct.error as e:
+                    raise ValueError(f"Student {s.code} can't go in the snapshot: {e}") from None
+                strings += code
+                strings += name
+                written += 1
+            if written != count:
+                raise ValueError(f"Expected {count} students but got {written}")
+            f.write(strings)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path(path))
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def read_header_count(file):
+    # The first line of studentMarks.txt says how many students follow, or None if it's unreadable
+    try:
+        return int(file.readline().strip())
+    except ValueError:
+        return None
+
+def iter_students(path, chunk_size=2000):
+    # Stream every well-formed student out of a register file without holding the file in memory,
+    # reading the binary snapshot instead when it's up to date
+    if snapshot_is_fresh(path):
+        try:
+            snapshot = StudentSnapshot(snapshot_path(path))
+        except (OSError, ValueError):
+            snapshot = None  # Damaged, or written by an older version - the text file still has everything
+        if snapshot is not None:
+            with snapshot:
+                for chunk in snapshot.iter_chunks(chunk_size):
+                    yield from chunk
+            return
+    with open(path, "r", encoding="utf-8") as file:
+        read_header_count(file)
+        for chunk in iter_student_chunks(file, chunk_size):
+            yield from chunk
+
+def split_byte_ranges(path, start, range_bytes=PARALLEL_RANGE_BYTES):
+    # Cut the file from start to the end into (start, end) byte ranges of roughly range_bytes,
+    # each moved forward to just after a newline so no line is ever split between two ranges
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        while start < size:
+            end = min(start + range_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def parse_byte_range(path, start, end):
+    # Runs in a worker process. Parses one byte range with the same text decoding and malformed-line
+    # rules as a serial load, and sends it back column by column: the codes and the names as single
+    # newline-joined strings and the four marks per student in a flat array. That pickles dozens of
+    # times faster than a list of tuples or Student objects
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    codes, names, marks = [], [], []
+    for line in io.TextIOWrapper(io.BytesIO(data), encoding="utf-8"):
+        fields = parse_student_fields(line)
+        if fields is not None:
+            codes.append(fields[0])
+            names.append(fields[1])
+            marks.extend(fields[2:])
+    try:
+        marks = array.array("q", marks)
+    except OverflowError:
+        pass  # Absurdly large marks still parse, they just travel as a plain list
+    return len(codes), "\n".join(codes), "\n".join(names), marks
+
+def students_from_range(count, codes, names, marks):
+    # Rebuild the Student objects from what parse_byte_range sent back
+    if not count:
+        return []
+    m = iter(marks)
+    return list(map(Student, codes.split("\n"), names.split("\n"), m, m, m, m))
+
+def iter_students_parallel(path, chunk_size=2000, workers=None):
+    # Parse the text register across a pool of processes, one byte range per task, and hand the
+    # students back in chunks in file order. The snapshot isn't used here, it's already faster
+    with open(path, "rb") as file:
+        file.readline()  # The count header
+        ranges = split_byte_ranges(path, file.tell())
+    if not ranges:
+        return
+    # Spawned rather than forked workers, as the app runs this from a thread next to Tk
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # map() keeps the results in submission order, so file order survives the merge
+        results = pool.map(parse_byte_range, itertools.repeat(path), *zip(*ranges))
+        try:
+            for parsed in results:
+                students = students_from_range(*parsed)
+                for i in range(0, len(students), chunk_size):
+                    yield students[i:i + chunk_size]
+        finally:
+            # A consumer that stops early (a cancelled load) shouldn't wait for the rest of the file
+            pool.shutdown(wait=False, cancel_futures=True)
+
+def use_parallel_parse(path):
+    # Worth starting worker processes only for a big text register on a machine with cores to spare
+    return ((os.cpu_count() or 1) > 1 and not snapshot_is_fresh(path)
+            and os.path.getsize(path) >= PARALLEL_MIN_BYTES)
+
+def load_students(path, replay_journal=True, parallel=None):
+    # Read a whole register into a StudentStore, folding in any journalled changes.
+    # Duplicate IDs keep the first record, the same as the app does. parallel=None decides
+    # from the file size and core count
+    if parallel is None:
+        parallel = use_parallel_parse(path)
+    store = StudentStore()
+    students = itertools.chain.from_iterable(iter_students_parallel(path)) if parallel else iter_students(path)
+    # One sort of the orderings at the end rather than a bisect insert per student
+    with store.bulk():
+        for student in students:
+            if student.code not in store:
+                store.add(student)
+        if replay_journal:
+            StudentJournal(path + JOURNAL_SUFFIX).replay(store)
+    return store
+
+def save_students(path, students, count=None):
+    # Write the register to a temporary file first and swap it in, so the old
+    # file stays intact if we crash half way through
+    if count is None:
+        count = len(students)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"{count}\n")
+            for s in students:
+                f.write(s.to_record() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def parse_student_block(text):
+    # Parse pasted lines of code,name,m1,m2,m3,exam. Blank lines are ignored and every bad
+    # line is reported by number, so one typo doesn't throw away the rest of the block
+    students, errors = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        student = parse_student_record(line)
+        if student is None:
+            errors.append(f"Line {number}: expected code,name,mark1,mark2,mark3,exam")
+        elif not student.code or not student.name:
+            errors.append(f"Line {number}: ID and Name cannot be empty")
+        else:
+            students.append(student)
+    return students, errors
+
+def curve_updates(students, points, cap=100):
+    # (code, 'exam_mark', new mark) for every student whose exam mark moves when raised (or lowered)
+    # by points, keeping the result between 0 and cap
+    updates = []
+    for s in students:
+        mark = max(0, min(cap, s.exam_mark + points))
+        if mark != s.exam_mark:
+            updates.append((s.code, 'exam_mark', mark))
+    return updates
+
+def iter_csv_students(path):
+    # Each row of a code,name,m1,m2,m3,exam CSV as a Student, or None for rows that don't parse
+    with open(path, "r", encoding="utf-8", newline="") as source:
+        for row in csv.reader(source):
+            yield parse_student_record(",".join(row))
+
+def export_graded(path, students, progress=None, every=5000):
+    # Write students with their totals, percentage and grade to CSV. progress(count) is called
+    # every few thousand rows, and may raise to stop the export part way
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_HEADER)
+        for student in students:
+            writer.writerow(graded_row(student))
+            count += 1
+            if progress is not None and count % every == 0:
+                progress(count)
+    return count
+
+def top_students(students, n, highest=True):
+    # The n best (or worst) students from any iterable, holding only n of them in memory at a time
+    pick = heapq.nlargest if highest else heapq.nsmallest
+    return pick(n, students, key=SORT_KEYS["percentage"])
+
+def grade_counts(students):
+    # Per-grade head count plus the class size and average percentage, in a single pass
+    counts = dict.fromkeys(GRADES, 0)
+    total = 0
+    percentage_sum = 0.0
+    for s in students:
+        counts[s.grade] += 1
+        total += 1
+        percentage_sum += s.percentage
+    return counts, total, (percentage_sum / total if total else 0.0)
+
+def graded_row(student):
+    return (student.code, student.name, student.coursework_total, student.exam_mark,
+            student.overall_total, f"{student.percentage:.1f}", student.grade)
@@ -0,0 +1,242 @@
+# Timing probes shared by the three exercise apps. instrument() wraps a class's handler methods so
+# every call is counted and its latency dropped into a histogram; the cost is two perf_counter()
+# calls and a bisect per call. Press F12 in any of the apps to toggle a live overlay of the numbers.
+#
+#   PERF_PROBES=0                              turn the probes off completely
+#   PERF_DUMP=session.json                     write every probe to this file when the app exits
+#   PERF_PROFILE=JokeApp.fetch_new_content     run the first call of that handler under cProfile
+#                                              (a bare method name such as checkAnswer works too)
+#   PERF_PROFILE_DIR=/tmp                      where the .prof file goes (default: current directory)
+#
+# Handlers that open a dialog include the time the dialog is open, so judge those by their max
+#
+# The apps import this module only if it can be found (and say so on stderr when it can't), so run them
+# with this folder on the path. From the portfolio folder:
+#   PYTHONPATH=. python EX_1/quiz.py
+#   PYTHONPATH=. python EX_2/joke_app.py
+#   PYTHONPATH=. python "EX_3/student manager.py"
+# (on Windows: set PYTHONPATH=. first, then run the app)
+import atexit
+import bisect
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Upper edges of the histogram buckets in milliseconds. Anything slower lands in a final open bucket.
+# Around 16 ms is where a handler starts to drop frames, and past 100 ms the window visibly hangs
+BUCKET_EDGES_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000, 2500)
+OVERLAY_REFRESH_MS = 1000
+OVERLAY_KEY = "<F12>"
+PROFILE_TOP = 25  # Functions printed from a cProfile capture
+
+class Probe:
+    # Call count, total/max time and a latency histogram for one handler
+    __slots__ = ("name", "count", "total", "max", "buckets")
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_EDGES_MS) + 1)
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKET_EDGES_MS, ms)] += 1
+
+    def quantile(self, q):
+        # The upper edge of the bucket the q-th fraction of calls falls in (the max for the last one)
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(BUCKET_EDGES_MS[i], self.max) if i < len(BUCKET_EDGES_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        edges = [f"<={edge}" for edge in BUCKET_EDGES_MS] + [f">{BUCKET_EDGES_MS[-1]}"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "histogram_ms": dict(zip(edges, self.buckets)),
+        }
+
+class ProbeRegistry:
+    def __init__(self):
+        self.enabled = os.environ.get("PERF_PROBES", "1") != "0"
+        self.probes = {}
+        self.gauges = {}  # name -> function returning a dict of numbers, read whenever the report is
+        self.started = time.time()
+        self.profile_target = os.environ.get("PERF_PROFILE") or None
+        self.profile_dir = os.environ.get("PERF_PROFILE_DIR") or os.getcwd()
+        self.lock = threading.Lock()  # Probes can fire on worker threads too (an I/O poll, a prefetch)
+
+    def probe(self, name):
+        probe = self.probes.get(name)
+        if probe is None:
+            probe = self.probes.setdefault(name, Probe(name))
+        return probe
+
+    def wrap(self, name, func):
+        probe = self.probe(name)
+        profile = self.profile_target in (name, name.rsplit(".", 1)[-1])
+        lock = self.lock
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            nonlocal profile
+            if profile:
+                profile = False  # Only the first call is captured
+                return self.run_profiled(name, probe, func, args, kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with lock:
+                    probe.record(elapsed)
+        return timed
+
+    def run_profiled(self, name, probe, func, args, kwargs):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            probe.record(time.perf_counter() - started)
+            path = os.path.join(self.profile_dir, f"{name}.prof")
+            try:
+                profiler.dump_stats(path)
+            except OSError as e:
+                path = f"not saved ({e})"
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            print(f"cProfile of {name}, stats file {path}\n{report.getvalue()}", file=sys.stderr)
+
+    def gauge(self, name, read):
+        # Show something that isn't a timing (a cache's hit rate, a queue's length) alongside the probes
+        if self.enabled:
+            self.gauges[name] = read
+
+    def read_gauges(self):
+        values = {}
+        for name, read in sorted(self.gauges.items()):
+            try:
+                values[name] = read()
+            except Exception as e:  # A broken gauge shouldn't take the overlay down with it
+                values[name] = {"error": str(e)}
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            return {name: probe.to_dict() for name, probe in sorted(self.probes.items()) if probe.count}
+
+    def report_lines(self):
+        lines = [f"{'handler':<38} {'calls':>6} {'mean':>8} {'p50<=':>7} {'p99<=':>7} {'max':>8}  ms"]
+        for name, stats in self.snapshot().items():
+            lines.append(f"{name:<38} {stats['count']:>6} {stats['mean_ms']:>8.2f} {stats['p50_ms']:>7.1f} "
+                         f"{stats['p99_ms']:>7.1f} {stats['max_ms']:>8.1f}")
+        if len(lines) == 1:
+            lines.append("(nothing recorded yet)")
+        for name, values in self.read_gauges().items():
+            lines.append(f"{name}: " + "  ".join(f"{key} {value}" for key, value in values.items()))
+        return lines
+
+    def dump(self, path=None):
+        # Write every probe to JSON and return the path used
+        if path is None:
+            path = os.environ.get("PERF_DUMP") or f"perf-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": round(time.time() - self.started, 1),
+                "bucket_edges_ms": list(BUCKET_EDGES_MS),
+                "probes": self.snapshot(),
+                "gauges": self.read_gauges(),
+            }, f, indent=2)
+        return path
+
+probes = ProbeRegistry()
+
+if probes.enabled and os.environ.get("PERF_DUMP"):
+    atexit.register(probes.dump)
+
+def instrument(cls, *method_names, registry=probes):
+    # Swap each named method on cls for a timed wrapper. Call this before the app is created, so the
+    # buttons and bindings pick up the wrapped methods
+    if not registry.enabled:
+        return cls
+    for method_name in method_names:
+        setattr(cls, method_name, registry.wrap(f"{cls.__name__}.{method_name}", getattr(cls, method_name)))
+    return cls
+
+class PerfOverlay:
+    # A small always-on-top window with the probe table, refreshed while it's open
+    def __init__(self, root, registry=probes):
+        self.root = root
+        self.registry = registry
+        self.window = None
+        self.after_id = None
+
+    def toggle(self, event=None):
+        if self.window is not None:
+            self.close()
+            return
+        import tkinter as tk
+
+        self.window = tk.Toplevel(self.root)
+        self.window.title("Performance")
+        self.window.attributes("-topmost", True)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.text = tk.Text(self.window, width=78, height=20, font=("Courier", 9), bg="#111827", fg="#e5e7eb")
+        self.text.pack(fill=tk.BOTH, expand=True)
+        buttons = tk.Frame(self.window)
+        buttons.pack(fill=tk.X)
+        tk.Button(buttons, text="Dump to File", command=self.dump).pack(side=tk.LEFT, padx=5, pady=5)
+        self.status = tk.Label(buttons, text=f"{OVERLAY_KEY} to hide", anchor="w")
+        self.status.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.window.bind(OVERLAY_KEY, self.toggle)
+        self.refresh()
+
+    def refresh(self):
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(self.registry.report_lines()))
+        self.after_id = self.window.after(OVERLAY_REFRESH_MS, self.refresh)
+
+    def dump(self):
+        try:
+            self.status.config(text=f"Saved {os.path.abspath(self.registry.dump())}")
+        except OSError as e:
+            self.status.config(text=f"Could not save: {e}")
+
+    def close(self):
+        if self.after_id is not None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+        self.window.destroy()
+        self.window = None
+
+def attach_overlay(root, registry=probes):
+    # Bind the overlay's toggle key on the app's main window
+    if not registry.enabled:
+        return None
+    overlay = PerfOverlay(root, registry)
+    root.bind(OVERLAY_KEY, overlay.toggle)
+    return overlay
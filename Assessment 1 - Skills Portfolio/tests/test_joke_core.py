@@ -0,0 +1,185 @@
+import json
+
+import threading
+
+import pytest
+
+import joke_core
+from joke_core import JokeDeck, JokePrefetcher, JokeSearchIndex, parse_jokes
+
+
+# --- Deck ---
+
+def deal(deck, count, n):
+    return [deck.draw(count) for _ in range(n)]
+
+
+def test_deck_deals_every_joke_once_before_repeating(tmp_path):
+    deck = JokeDeck(str(tmp_path / "jokes.deck"))
+    first = deal(deck, 50, 50)
+    assert sorted(first) == list(range(50))
+    second = deal(deck, 50, 50)
+    assert sorted(second) == list(range(50))
+    assert second[0] != first[-1]
+
+
+def test_new_jokes_are_mixed_into_the_undealt_part(tmp_path):
+    deck = JokeDeck(str(tmp_path / "jokes.deck"))
+    dealt = deal(deck, 20, 15)
+    dealt += deal(deck, 30, 5)
+    dealt += deal(deck, 1000, 1000 - len(dealt))
+    assert sorted(dealt) == list(range(1000))
+    assert deck.draw(0) is None
+
+
+def test_deck_carries_on_after_a_restart(tmp_path):
+    path = str(tmp_path / "jokes.deck")
+    deck = JokeDeck(path)
+    dealt = deal(deck, 10, 4) + deal(deck, 40, 3)
+
+    again = JokeDeck(path)
+    again.load()
+    assert list(again.order) == list(deck.order) and again.cursor == deck.cursor
+    dealt += deal(again, 40, 40 - len(dealt))
+    assert sorted(dealt) == list(range(40))
+
+
+def test_cursor_from_another_shuffle_starts_a_fresh_deck(tmp_path):
+    path = str(tmp_path / "jokes.deck")
+    deal(JokeDeck(path), 10, 3)
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state["order"] += 1  # The order file was replaced, but the cursor file never caught up
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+    deck = JokeDeck(path)
+    deck.load()
+    assert deck.cursor == 0 and len(deck.order) == 0
+    assert sorted(deal(deck, 10, 10)) == list(range(10))
+
+
+def test_growing_the_deck_only_touches_the_new_jokes(tmp_path, monkeypatch):
+    deck = JokeDeck(str(tmp_path / "jokes.deck"))
+    deal(deck, 1000, 10)
+    calls = []
+    monkeypatch.setattr(joke_core.random, "shuffle", lambda *args: calls.append(args))
+    deal(deck, 1005, 1)
+    assert calls == []  # No reshuffle of the undealt jokes, just a swap per new one
+    assert sorted(deck.order) == list(range(1005))
+
+
+# --- Prefetch ---
+
+def test_prefetcher_counts_one_miss_per_click():
+    release = threading.Event()
+
+    def source():
+        release.wait()
+        return ("Setup?", "Punchline")
+
+    prefetcher = JokePrefetcher(source, depth=2).start()
+    try:
+        assert prefetcher.take() is None
+        assert prefetcher.take(retry=True) is None
+        release.set()
+        joke = None
+        while joke is None:
+            joke = prefetcher.take(retry=True)
+        assert joke == ("Setup?", "Punchline")
+        assert (prefetcher.hits, prefetcher.misses) == (1, 1)
+    finally:
+        prefetcher.stop()
+
+
+# --- Search index ---
+
+@pytest.fixture
+def joke_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(joke_core, "SIDECAR_DIR", str(tmp_path / "sidecars"))
+    return tmp_path / "jokes.txt"
+
+
+def indexed_jokes(index):
+    return [index.joke(i) for i in range(len(index))]
+
+
+def parsed_jokes(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_jokes(f)
+
+
+def found(index, query):
+    return [index.joke(doc) for _, doc in index.search(query)]
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+def test_search_ranks_matches_and_completes_the_last_word(joke_file):
+    joke_file.write_text("Why did the chicken cross the road?To get to the other side.\n"
+                         "What do you call a chicken chicken?A double chicken.\n"
+                         "Why was the cat sad?It had a bad day.\n", encoding="utf-8")
+    index = JokeSearchIndex(str(joke_file))
+    assert index.update()
+    assert found(index, "chicken ")[0][0] == "What do you call a chicken chicken?"
+    assert len(found(index, "chick")) == 2
+    assert found(index, "cat sad ") == [("Why was the cat sad?", "It had a bad day.")]
+    assert found(index, "chicken cat ") == []
+
+
+def test_appended_jokes_are_indexed_without_a_rebuild(joke_file, monkeypatch):
+    joke_file.write_text("Why did the chicken cross the road?To get to the other side.\n", encoding="utf-8")
+    index = JokeSearchIndex(str(joke_file))
+    index.update()
+    monkeypatch.setattr(index, "_clear", lambda: pytest.fail("rebuilt from scratch"))
+    append(joke_file, "What is a zebra?A striped horse.\n")
+    index.update()
+    assert indexed_jokes(index) == parsed_jokes(joke_file)
+    assert found(index, "zebra ") == [("What is a zebra?", "A striped horse.")]
+
+
+def test_a_same_size_edit_is_indexed_again(joke_file):
+    joke_file.write_text("Why did the hipster burn his tongue?He drank his coffee before it was cool.\n",
+                         encoding="utf-8")
+    index = JokeSearchIndex(str(joke_file))
+    index.update()
+    joke_file.write_text("Why did the hopster burn his tongue?He drank his coffee before it was cool.\n",
+                         encoding="utf-8")
+    index.update()
+    assert found(index, "hipster ") == []
+    assert len(found(index, "hopster ")) == 1
+
+
+def test_append_continuing_an_unfinished_last_line(joke_file):
+    joke_file.write_text("Why did the chicken cross the road?To get to the other side.\nWhat is a cache?",
+                         encoding="utf-8")  # No newline at the end, like the bundled file
+    index = JokeSearchIndex(str(joke_file))
+    index.update()
+    append(joke_file, " A place to hide things\n")
+    index.update()
+    assert indexed_jokes(index) == parsed_jokes(joke_file)
+    assert found(index, "hide ") == [("What is a cache?", "A place to hide things")]
+    assert found(index, "place ") == [("What is a cache?", "A place to hide things")]
+    assert len(index.search("cache ")) == 1
+
+
+def test_append_answering_a_question_left_open(joke_file):
+    joke_file.write_text("Why did the chicken cross the road?To get to the other side.\nWhat is a cache?\n",
+                         encoding="utf-8")
+    index = JokeSearchIndex(str(joke_file))
+    index.update()
+    assert found(index, "cache ") == [("What is a cache?", "")]
+    append(joke_file, "A place to hide things\nWhy was the cat sad?It had a bad day.\n")
+    index.update()
+    assert indexed_jokes(index) == parsed_jokes(joke_file)
+    assert found(index, "hide ") == [("What is a cache?", "A place to hide things")]
+    assert len(found(index, "cat ")) == 1
+
+    # ...and the saved index picks up where it left off
+    reloaded = JokeSearchIndex(str(joke_file))
+    reloaded.update()
+    assert indexed_jokes(reloaded) == parsed_jokes(joke_file)
+    assert reloaded.total_words == index.total_words
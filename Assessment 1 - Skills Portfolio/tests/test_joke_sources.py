@@ -0,0 +1,120 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from joke_core import JOKES_PATH, parse_jokes
+from joke_sources import CachedSource, HttpSource, JokeCache, JokeSource, build_sources, stub_server
+
+with open(JOKES_PATH, "r", encoding="utf-8") as f:
+    ALL_JOKES = set(parse_jokes(f))
+
+
+@pytest.fixture
+def stub():
+    server = stub_server(0)
+    server.RequestHandlerClass.log_message = lambda *args: None  # Keep the request log out of the test output
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def offline_url():
+    # A port nothing is listening on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = JokeCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_joke_source_is_abstract():
+    with pytest.raises(TypeError):
+        JokeSource()
+
+
+# --- HTTP ---
+
+def test_http_source_fetches_from_the_stub(stub):
+    source = HttpSource(stub)
+    assert source.next_joke() in ALL_JOKES
+    jokes = asyncio.run(source.fetch_batch_async(4))
+    assert len(jokes) == 4 and set(jokes) <= ALL_JOKES
+
+
+def test_http_source_offline_gives_nothing(offline_url):
+    source = HttpSource(offline_url, timeout=1)
+    assert source.next_joke() is None
+    assert asyncio.run(source.fetch_batch_async(3)) == []
+
+
+# --- Cache ---
+
+def test_cache_hands_out_the_least_recently_used_joke(cache):
+    cache.put_many("src", [("A?", "a"), ("B?", "b"), ("C?", "c")])
+    first = [cache.take("src") for _ in range(3)]
+    assert sorted(first) == [("A?", "a"), ("B?", "b"), ("C?", "c")]
+    assert cache.take("src") == first[0]
+    assert cache.take("other") is None
+
+
+def test_cache_evicts_least_recently_used_past_its_size(tmp_path):
+    cache = JokeCache(str(tmp_path / "cache.db"), max_bytes=20)
+    try:
+        cache.put_many("src", [("One?", "1")])  # 5 bytes each
+        time.sleep(0.01)
+        cache.put_many("src", [("Two?", "2")])
+        time.sleep(0.01)
+        assert cache.take("src") == ("One?", "1")  # The oldest, and now the most recently used
+        time.sleep(0.01)
+        cache.put_many("src", [("Three?", "3"), ("Four?", "4")])  # 7 and 6 bytes: 23 in total
+        assert cache.count("src") == 3
+        remaining = {cache.take("src") for _ in range(3)}
+        assert ("Two?", "2") not in remaining
+        assert ("One?", "1") in remaining
+    finally:
+        cache.close()
+
+
+def test_cached_source_fills_from_the_stub_and_answers_from_the_cache(stub, cache):
+    source = CachedSource(HttpSource(stub), cache, batch=4)
+    source.next_joke()  # Starts the first refill; the cache may well still be empty
+    wait_for(lambda: cache.count(source.name) >= 4)
+    for _ in range(10):
+        assert source.next_joke() in ALL_JOKES
+
+
+def test_cached_source_keeps_serving_when_the_service_goes_offline(offline_url, cache):
+    source = CachedSource(HttpSource(offline_url, timeout=1), cache, batch=2)
+    cache.put_many(source.name, [("Cached?", "Yes")])
+    assert source.next_joke() == ("Cached?", "Yes")
+    wait_for(lambda: not source._refilling)
+    assert source._retry_at > time.monotonic()  # Backs off rather than hammering a dead service
+    assert source.next_joke() == ("Cached?", "Yes")
+
+
+def test_build_sources_puts_http_behind_the_cache(stub, tmp_path):
+    source = build_sources(f"{stub}", cache_path=str(tmp_path / "cache.db"))
+    try:
+        assert isinstance(source, CachedSource) and isinstance(source.source, HttpSource)
+    finally:
+        source.close()
+        source.cache.close()
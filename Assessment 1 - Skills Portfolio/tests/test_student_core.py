@@ -0,0 +1,170 @@
+import os
+import time
+
+import pytest
+
+from student_core import (JOURNAL_SUFFIX, SNAPSHOT_HEADER, SNAPSHOT_MAGIC, Student, StudentJournal, StudentSnapshot,
+                          StudentStore, iter_students, iter_students_parallel, load_students, parse_byte_range,
+                          save_snapshot, save_students, snapshot_is_fresh, snapshot_path, split_byte_ranges,
+                          students_from_range)
+
+
+def make_register(path, students):
+    save_students(str(path), students)
+    return str(path)
+
+
+def codes(store):
+    return sorted(s.code for s in store)
+
+
+# --- Journal ---
+
+def test_journal_replays_adds_deletes_and_renames(tmp_path):
+    path = make_register(tmp_path / "marks.txt", [Student("1001", "Ann", 10, 10, 10, 50)])
+    journal = StudentJournal(path + JOURNAL_SUFFIX)
+    journal.append("+", "1002", "Bob", "5", "6", "7", "40")
+    journal.append(">", "1001", "1003")
+    journal.append("-", "1002")
+
+    store = load_students(path)
+    assert codes(store) == ["1003"]
+    assert store.get("1003").name == "Ann"
+    assert journal.pending()
+
+
+def test_journal_skips_torn_last_line(tmp_path):
+    journal = StudentJournal(str(tmp_path / "j"))
+    journal.append("+", "1001", "Ann", "1", "2", "3", "4")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write("+,1002,Bo")  # A crash mid-write
+
+    store = StudentStore()
+    assert journal.replay(store) == 1
+    assert codes(store) == ["1001"]
+
+
+def test_journal_changes_that_no_longer_apply_are_skipped(tmp_path):
+    journal = StudentJournal(str(tmp_path / "j"))
+    journal.append("-", "9999")
+    journal.append(">", "9998", "9997")
+    store = StudentStore([Student("1001", "Ann", 1, 2, 3, 4)])
+
+    # Replaying twice (after an interrupted compaction) gives the same result
+    journal.replay(store)
+    journal.replay(store)
+    assert codes(store) == ["1001"]
+
+
+def test_compaction_keeps_changes_made_during_the_save(tmp_path):
+    path = make_register(tmp_path / "marks.txt", [])
+    journal = StudentJournal(path + JOURNAL_SUFFIX)
+    journal.append("+", "1001", "Ann", "1", "2", "3", "4")
+
+    journal.begin_compaction()
+    journal.append("+", "1002", "Bob", "1", "2", "3", "4")  # Arrives while the save runs
+    save_students(path, [Student("1001", "Ann", 1, 2, 3, 4)])
+    journal.end_compaction()
+
+    assert not os.path.exists(journal.compacting_path)
+    assert codes(load_students(path)) == ["1001", "1002"]
+
+
+def test_failed_compaction_is_replayed_before_newer_changes(tmp_path):
+    path = make_register(tmp_path / "marks.txt", [])
+    journal = StudentJournal(path + JOURNAL_SUFFIX)
+    journal.append("+", "1001", "Ann", "1", "2", "3", "4")
+    journal.begin_compaction()  # ...and the save never finishes
+    journal.append("-", "1001")
+
+    assert codes(load_students(path)) == []
+
+
+# --- Snapshot ---
+
+def records(students):
+    return [s.to_record() for s in students]
+
+
+def test_snapshot_round_trip(tmp_path):
+    students = [Student("1001", "Ann", 10, 11, 12, 60), Student("1002", "Zoë Ó", 0, 20, 5, 99)]
+    path = make_register(tmp_path / "marks.txt", students)
+    save_snapshot(path, students)
+
+    with StudentSnapshot(snapshot_path(path)) as snapshot:
+        assert len(snapshot) == 2
+        assert snapshot[1].name == "Zoë Ó"
+        assert records(snapshot) == records(students)
+        assert [records(chunk) for chunk in snapshot.iter_chunks(1)] == [[r] for r in records(students)]
+    assert snapshot_is_fresh(path)
+    assert records(iter_students(path)) == records(students)
+
+
+def test_snapshot_too_big_for_a_record_keeps_the_old_one(tmp_path):
+    path = str(tmp_path / "marks.txt")
+    save_snapshot(path, [Student("1001", "Ann", 1, 2, 3, 4)])
+    with pytest.raises(ValueError):
+        save_snapshot(path, [Student("1002", "Bob", 1, 2, 3, 2 ** 40)])
+
+    assert not os.path.exists(snapshot_path(path) + ".tmp")
+    with StudentSnapshot(snapshot_path(path)) as snapshot:
+        assert records(snapshot) == ["1001,Ann,1,2,3,4"]
+
+
+def test_stale_or_foreign_snapshot_falls_back_to_the_text_file(tmp_path):
+    path = str(tmp_path / "marks.txt")
+    save_snapshot(path, [Student("1001", "Old", 1, 2, 3, 4)])
+    time.sleep(0.01)
+    make_register(path, [Student("1001", "New", 1, 2, 3, 4)])
+    assert not snapshot_is_fresh(path)
+    assert records(iter_students(path)) == ["1001,New,1,2,3,4"]
+
+    # A snapshot from another version is ignored even when it looks fresh
+    with open(snapshot_path(path), "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 1, 0, 0, SNAPSHOT_HEADER.size, SNAPSHOT_HEADER.size))
+    assert snapshot_is_fresh(path)
+    assert records(iter_students(path)) == ["1001,New,1,2,3,4"]
+
+
+# --- Parallel parse ---
+
+def write_messy_register(path):
+    lines = [f"{1000 + i},Student {i} é,{i % 21},{i % 20},{(i * 7) % 21},{i % 101}" for i in range(500)]
+    lines[10] = "not,a,student"
+    lines[20] = ""
+    lines[30] = "1030,Short,1,2"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{len(lines)}\n" + "\r\n".join(lines))  # Windows line ends and no newline at the end
+    return str(path)
+
+
+def test_byte_ranges_cover_the_file_on_line_boundaries(tmp_path):
+    path = write_messy_register(tmp_path / "marks.txt")
+    ranges = split_byte_ranges(path, 4, range_bytes=1000)
+    assert len(ranges) > 5
+    assert ranges[0][0] == 4 and ranges[-1][1] == os.path.getsize(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+def test_parsing_by_range_matches_a_serial_parse(tmp_path):
+    path = write_messy_register(tmp_path / "marks.txt")
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+    parsed = []
+    for range_start, range_end in split_byte_ranges(path, start, range_bytes=700):
+        parsed += students_from_range(*parse_byte_range(path, range_start, range_end))
+    serial = list(iter_students(path))
+    assert len(serial) == 497
+    assert records(parsed) == records(serial)
+
+
+def test_parallel_load_matches_a_serial_load(tmp_path):
+    path = write_messy_register(tmp_path / "marks.txt")
+    chunks = list(iter_students_parallel(path, chunk_size=100, workers=2))
+    assert max(len(chunk) for chunk in chunks) <= 100
+    assert records(s for chunk in chunks for s in chunk) == records(iter_students(path))
+    assert codes(load_students(path, parallel=True)) == codes(load_students(path, parallel=False))